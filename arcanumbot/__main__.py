@@ -1,10 +1,26 @@
+import asyncio
 import logging
 import os
 from pathlib import Path
 
 import click
+from discord.ext.commands import CommandError
 
 from arcanumbot import ArcanumBot
+from arcanumbot.db import (
+    BACKENDS,
+    DEFAULT_FLUSH_INTERVAL,
+    DEFAULT_FLUSH_SIZE,
+    DEFAULT_MAX_INACTIVE_CONNECTION_LIFETIME,
+    DEFAULT_POOL_MAX_SIZE,
+    DEFAULT_POOL_MIN_SIZE,
+    DEFAULT_SQLITE_PATH,
+    DEFAULT_STATEMENT_CACHE_SIZE,
+    Database,
+    PostgresBackend,
+    SQLiteBackend,
+)
+from arcanumbot.profiles import DEFAULT_PROFILE, PROFILES
 
 # only works on linux
 try:
@@ -21,21 +37,151 @@ os.environ["JISHAKU_NO_UNDERSCORE"] = "true"
 os.environ["JISHAKU_RETAIN"] = "true"
 
 
-@click.command()
+@click.group(invoke_without_command=True)
 @click.option(
     "--secret",
     help="Path to secret file",
-    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    # not checked for existence here since backup and restore don't need it
+    type=click.Path(dir_okay=False, path_type=Path),
     default="discord_token.secret",
 )
-def main(secret: Path):
+@click.option(
+    "--backend",
+    "backend_name",
+    help="Where coins, cooldowns and purple hearts are stored",
+    type=click.Choice(list(BACKENDS)),
+    default="postgres",
+    show_default=True,
+)
+@click.option(
+    "--sqlite-path",
+    help="Database file used by the sqlite backend",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=DEFAULT_SQLITE_PATH,
+    show_default=True,
+)
+@click.option(
+    "--pool-min-size",
+    help="Postgres connections opened at startup and kept open",
+    type=click.IntRange(min=0),
+    default=DEFAULT_POOL_MIN_SIZE,
+    show_default=True,
+    envvar="ARCANUMBOT_POOL_MIN_SIZE",
+)
+@click.option(
+    "--pool-max-size",
+    help="Max number of postgres connections",
+    type=click.IntRange(min=1),
+    default=DEFAULT_POOL_MAX_SIZE,
+    show_default=True,
+    envvar="ARCANUMBOT_POOL_MAX_SIZE",
+)
+@click.option(
+    "--statement-cache-size",
+    help="Prepared statements cached per postgres connection, 0 disables the cache",
+    type=click.IntRange(min=0),
+    default=DEFAULT_STATEMENT_CACHE_SIZE,
+    show_default=True,
+    envvar="ARCANUMBOT_STATEMENT_CACHE_SIZE",
+)
+@click.option(
+    "--max-inactive-connection-lifetime",
+    help="Seconds an idle postgres connection is kept open, 0 keeps them forever",
+    type=click.FloatRange(min=0),
+    default=DEFAULT_MAX_INACTIVE_CONNECTION_LIFETIME,
+    show_default=True,
+    envvar="ARCANUMBOT_MAX_INACTIVE_CONNECTION_LIFETIME",
+)
+@click.option(
+    "--memory-profile",
+    help="Intents, member cache and message cache trade-off, see arcanumbot/profiles.py",
+    type=click.Choice(list(PROFILES)),
+    default=DEFAULT_PROFILE,
+    show_default=True,
+    envvar="ARCANUMBOT_MEMORY_PROFILE",
+)
+@click.option(
+    "--jishaku/--no-jishaku",
+    help="Load the jishaku debugging extension",
+    default=True,
+    show_default=True,
+)
+@click.option(
+    "--write-behind/--no-write-behind",
+    help="Buffer coin changes and write them in batches",
+    default=False,
+    show_default=True,
+)
+@click.option(
+    "--flush-interval",
+    help="Milliseconds a buffered coin change can wait before being written",
+    type=click.FloatRange(min=0),
+    default=DEFAULT_FLUSH_INTERVAL * 1000,
+    show_default=True,
+)
+@click.option(
+    "--flush-size",
+    help="Number of buffered accounts that triggers an early write",
+    type=click.IntRange(min=1),
+    default=DEFAULT_FLUSH_SIZE,
+    show_default=True,
+)
+@click.pass_context
+def main(
+    ctx: click.Context,
+    secret: Path,
+    backend_name: str,
+    sqlite_path: Path,
+    pool_min_size: int,
+    pool_max_size: int,
+    statement_cache_size: int,
+    max_inactive_connection_lifetime: float,
+    memory_profile: str,
+    jishaku: bool,
+    write_behind: bool,
+    flush_interval: float,
+    flush_size: int,
+):
     logging.basicConfig(
         format="[%(asctime)s] [%(levelname)s:%(name)s] %(message)s", level=logging.INFO
     )
 
     logging.getLogger("discord").setLevel(logging.ERROR)
 
-    bot = ArcanumBot()
+    if pool_min_size > pool_max_size:
+        raise click.BadParameter(
+            "can't be larger than --pool-max-size", param_hint="--pool-min-size"
+        )
+
+    if backend_name == "postgres":
+        backend = PostgresBackend(
+            min_size=pool_min_size,
+            max_size=pool_max_size,
+            statement_cache_size=statement_cache_size,
+            max_inactive_connection_lifetime=max_inactive_connection_lifetime,
+        )
+    elif backend_name == "sqlite":
+        backend = SQLiteBackend(sqlite_path)
+    else:
+        backend = BACKENDS[backend_name]()
+
+    database = Database(
+        backend=backend,
+        write_behind=write_behind,
+        flush_interval=flush_interval / 1000,
+        flush_size=flush_size,
+    )
+
+    if ctx.invoked_subcommand is not None:
+        ctx.obj = database
+        return
+
+    if not secret.is_file():
+        raise click.BadParameter(f"{secret} does not exist", param_hint="--secret")
+
+    bot = ArcanumBot(
+        database=database, load_jishaku=jishaku, profile=PROFILES[memory_profile]
+    )
 
     with open(secret) as fp:
         discord_token = fp.read().strip("\n")
@@ -43,5 +189,47 @@ def main(secret: Path):
     bot.run(discord_token)
 
 
+async def _run_on_database(database: Database, operation, path: Path) -> dict[str, int]:
+    await database.connect()
+
+    try:
+        return await operation(path)
+    finally:
+        await database.close()
+
+
+@main.command()
+@click.argument("path", type=click.Path(dir_okay=False, path_type=Path))
+@click.pass_obj
+def backup(database: Database, path: Path):
+    """
+    Back up coins, cooldowns and purple hearts to PATH
+    """
+    try:
+        counts = asyncio.run(_run_on_database(database, database.backup, path))
+    except CommandError as exc:
+        raise click.ClickException(str(exc))
+
+    click.echo(f"Backed up {counts} to {path}")
+
+
+@main.command()
+@click.argument("path", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.confirmation_option(
+    prompt="This replaces every balance, cooldown and purple heart, continue?"
+)
+@click.pass_obj
+def restore(database: Database, path: Path):
+    """
+    Replace coins, cooldowns and purple hearts with the backup at PATH
+    """
+    try:
+        counts = asyncio.run(_run_on_database(database, database.restore, path))
+    except CommandError as exc:
+        raise click.ClickException(str(exc))
+
+    click.echo(f"Restored {counts} from {path}")
+
+
 if __name__ == "__main__":
     main()
@@ -1,25 +1,65 @@
+import asyncio
+import collections
 import logging
 import pathlib
-from typing import Union
+import re
+import signal
+import time
+from typing import Any, Awaitable, Optional, Sequence, TypeVar, Union
 
 import discord
 from discord.ext import commands
 
 from . import SubContext, constants, db
+from .members import MemberResolver
+from .profiles import DEFAULT_PROFILE, PROFILES, MemoryProfile, current_rss
 
 logger = logging.getLogger(__name__)
 
 ROOT = pathlib.Path(__file__).parent
 
+T = TypeVar("T")
+
+
+def compile_prefix_filter(
+    prefix: Any, strip_after_prefix: bool
+) -> Optional[re.Pattern]:
+    """
+    Compile a matcher for a static command prefix that captures the invoked name
+
+    :param prefix: The bot's command_prefix
+    :param strip_after_prefix: If whitespace is allowed between prefix and name
+    :return: The matcher or None if the prefix is callable and can't be known up front
+    """
+    if callable(prefix):
+        return None
+
+    prefixes = (prefix,) if isinstance(prefix, str) else tuple(prefix)
+    # longest first so "aa!!" style prefixes aren't shadowed by shorter ones
+    alternatives = "|".join(
+        re.escape(value) for value in sorted(prefixes, key=len, reverse=True)
+    )
+    separator = r"\s*" if strip_after_prefix else ""
+
+    return re.compile(rf"(?:{alternatives}){separator}(\S*)", re.IGNORECASE)
+
 
 class ArcanumBot(commands.Bot):
     aacoin = constants.aacoin_emoji
 
-    def __init__(self, **kwargs):
+    def __init__(
+        self,
+        *,
+        database: Optional[db.Database] = None,
+        load_jishaku: bool = True,
+        profile: MemoryProfile = PROFILES[DEFAULT_PROFILE],
+        member_resolver: Optional[MemberResolver] = None,
+        **kwargs,
+    ):
         super().__init__(
             command_prefix=kwargs.pop("command_prefix", "aa!"),
             case_insensitive=kwargs.pop("case_insensitive", True),
-            max_messages=kwargs.pop("max_messages", 10_000),
+            max_messages=kwargs.pop("max_messages", profile.max_messages),
             help_command=kwargs.pop("help_command", commands.MinimalHelpCommand()),
             allowed_mentions=kwargs.pop(
                 "allowed_mentions",
@@ -29,12 +69,28 @@ class ArcanumBot(commands.Bot):
                 type=discord.ActivityType.listening,
                 name="aa!help",
             ),
-            intents=discord.Intents.all(),
+            intents=kwargs.pop("intents", profile.intents),
+            member_cache_flags=kwargs.pop(
+                "member_cache_flags", profile.member_cache_flags
+            ),
+            chunk_guilds_at_startup=kwargs.pop(
+                "chunk_guilds_at_startup", profile.chunk_guilds_at_startup
+            ),
             **kwargs,
         )
-        self.ready_once = False
+        self.profile = profile
         self.add_check(self.only_one_guild)
-        self.database = db.Database()
+        self.database = database or db.Database()
+        self.member_resolver = member_resolver or MemberResolver()
+        self.load_jishaku = load_jishaku
+        # seconds each startup phase took, in the order they finished
+        self.startup_timings: dict[str, float] = {}
+        self._startup_started: Optional[float] = None
+        self._reconcile_task: Optional[asyncio.Task] = None
+        self._close_task: Optional[asyncio.Task] = None
+        # messages rejected by the prefix filter vs ones turned into a context
+        self.message_counts: collections.Counter[str] = collections.Counter()
+        self._prefix_filter: tuple[Any, Optional[re.Pattern]] = (None, None)
 
     @property
     def guild(self):
@@ -55,36 +111,159 @@ class ArcanumBot(commands.Bot):
 
         return logging_channel
 
+    def might_be_command(self, content: str) -> bool:
+        """
+        Cheap check run before building a context for a message
+
+        Only rejects messages that can't invoke a command, anything it lets
+        through still goes through the full parsing
+
+        :param content: The message's content
+        :return: If the message starts with the prefix and a known command name
+        """
+        prefix, pattern = self._prefix_filter
+
+        # recompiled only if command_prefix was replaced
+        if prefix is not self.command_prefix:
+            pattern = compile_prefix_filter(
+                self.command_prefix, self.strip_after_prefix
+            )
+            self._prefix_filter = (self.command_prefix, pattern)
+
+        if pattern is None:
+            return True
+
+        match = pattern.match(content)
+        # all_commands includes aliases and ignores case when case_insensitive is set
+        return match is not None and match.group(1) in self.all_commands
+
     async def process_commands(self, message):
         if message.author.bot:
             return
 
+        if not self.might_be_command(message.content):
+            self.message_counts["filtered"] += 1
+            return
+
+        self.message_counts["dispatched"] += 1
         ctx = await self.get_context(message, cls=SubContext)
 
         await self.invoke(ctx)
 
     async def on_message_edit(self, before: discord.Message, after: discord.Message):
         if before.content != after.content:
+            # checked before the member fetch so edited chat costs nothing
+            if not self.might_be_command(after.content):
+                self.message_counts["filtered"] += 1
+                return
+
             if after.guild and not isinstance(after.author, discord.Member):
                 # Cache bug, after.author is User while before.author is Member
-                after.author = await after.guild.fetch_member(after.author.id)
+                member = await self.member_resolver.resolve(
+                    after.guild, after.author.id
+                )
+                if member is None:
+                    return
+
+                after.author = member
 
             await self.process_commands(after)
 
-    async def on_ready(self):
-        if self.ready_once:
-            return
+    # fetched members aren't updated by the gateway so drop them on any change
 
-        self.ready_once = True
+    async def on_member_join(self, member: discord.Member):
+        self.member_resolver.invalidate(member.guild.id, member.id)
 
-        await self.validate_coins()
-        await self.load_extension("jishaku")
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        self.member_resolver.invalidate(after.guild.id, after.id)
 
-        root = pathlib.Path(__file__).parent
-        extensions_path = root / "extensions"
-        await self.load_extensions_from_dir(extensions_path)
+    async def on_raw_member_remove(self, payload: discord.RawMemberRemoveEvent):
+        self.member_resolver.invalidate(payload.guild_id, payload.user.id)
+
+    async def _timed_phase(self, name: str, coro: Awaitable[T]) -> T:
+        start = time.perf_counter()
+
+        try:
+            return await coro
+        finally:
+            self.startup_timings[name] = time.perf_counter() - start
+
+    def _startup_report(self) -> str:
+        phases = ", ".join(
+            f"{name} {seconds:.2f}s" for name, seconds in self.startup_timings.items()
+        )
+        rss = current_rss() / 1024 / 1024
+        return (
+            f"Startup phases: {phases}; {self.profile.name} profile using {rss:.1f} MiB"
+        )
+
+    async def load_all_extensions(self) -> int:
+        loading = [self.load_extensions_from_dir(ROOT / "extensions")]
+
+        # jishaku is the slowest import of all, skipping it speeds up restarts
+        if self.load_jishaku:
+            loading.append(self.load_extension("jishaku"))
+
+        await asyncio.gather(*loading)
+        return len(self.extensions)
+
+    async def setup_hook(self):
+        self._startup_started = time.perf_counter()
+
+        # systemd stops the bot with SIGTERM, which run() doesn't handle, so the
+        # database's buffered writes would be dropped without this
+        try:
+            asyncio.get_running_loop().add_signal_handler(
+                signal.SIGTERM, self._begin_close
+            )
+        except NotImplementedError:
+            # event loops on windows don't support signal handlers
+            pass
+
+        # the pool warm up and extension loading don't depend on each other
+        await asyncio.gather(
+            self._timed_phase("database", self.database.connect()),
+            self._timed_phase("extensions", self.load_all_extensions()),
+        )
+        logger.info(f"Bot set up with {len(self.extensions.keys())} extensions.")
 
-        logger.info(f"Bot ready with {len(self.extensions.keys())} extensions.")
+        # reconciliation needs the guild cache, commands are served while it runs
+        self._reconcile_task = asyncio.create_task(self._reconcile())
+
+    async def _reconcile(self):
+        await self.wait_until_ready()
+        assert self._startup_started is not None
+        self.startup_timings["ready"] = time.perf_counter() - self._startup_started
+
+        try:
+            await self._timed_phase("reconciliation", self.validate_coins())
+        except Exception:
+            logger.exception("Coin reconciliation failed")
+
+        logger.info(self._startup_report())
+
+    def _begin_close(self) -> asyncio.Task:
+        if self._close_task is None:
+            logger.info("Shutting down")
+            self._close_task = asyncio.create_task(self._close())
+
+        return self._close_task
+
+    async def _close(self):
+        if self._reconcile_task is not None:
+            self._reconcile_task.cancel()
+
+        await super().close()
+        await self.database.close()
+
+    async def close(self):
+        # a signal and leaving run() both close the bot, the second waits on the first
+        await asyncio.shield(self._begin_close())
+
+    async def __aexit__(self, *exc_info):
+        # discord.py's version only waits for its own close, which finishes before
+        # the database is flushed, and run() cancels whatever is left after this
+        await asyncio.shield(self._begin_close())
 
     async def load_extensions_from_dir(self, path: Union[str, pathlib.Path]) -> int:
         """
@@ -113,12 +292,14 @@ class ArcanumBot(commands.Bot):
 
             extension_names.append(".".join(parts))
 
-        for ext in extension_names:
+        async def load(ext: str):
             try:
                 await self.load_extension("arcanumbot." + ext)
             except (commands.errors.ExtensionError, commands.errors.ExtensionFailed):
                 logger.exception("Failed loading " + ext)
 
+        await asyncio.gather(*(load(ext) for ext in extension_names))
+
         return len(self.extensions.keys()) - before
 
     async def only_one_guild(self, ctx: commands.Context):
@@ -134,10 +315,23 @@ class ArcanumBot(commands.Bot):
 
         return True
 
+    async def resolve_member(self, user_id: int) -> Optional[discord.Member]:
+        """
+        Get a member of the target guild without fetching them when avoidable
+
+        :param user_id: The id of the user
+        :return: The member or None if they aren't in the guild
+        """
+        return await self.member_resolver.resolve(self.guild, user_id)
+
     async def validate_coins(self):
+        # profiles that skip chunking at startup still need every member cached here
+        if not self.guild.chunked:
+            await self.guild.chunk()
+
         return await self.database.sync_coins_to_discord(self)
 
-    async def delete_user_aacoins(self, user_id):
+    async def delete_user_aacoins(self, user_id) -> Optional[int]:
         return await self.database.delete_coin_account(user_id)
 
     async def get_aacoin_amount(self, user_id) -> int:
@@ -146,21 +340,63 @@ class ArcanumBot(commands.Bot):
     async def get_aacoin_lb(self):
         return await self.database.get_all_coin_balances()
 
+    async def count_aacoin_accounts(self) -> int:
+        return await self.database.count_coin_accounts()
+
+    async def get_aacoin_rank(self, user_id: int) -> Optional[db.CoinRank]:
+        return await self.database.get_coin_rank(user_id)
+
     async def add_aacoins(self, user_id: int, amount: int) -> int:
         return await self.database.add_coins(user_id, amount)
 
     async def remove_aacoins(self, user_id: int, amount: int) -> int:
         return await self.database.remove_coins(user_id, amount)
 
+    async def credit_aacoins(self, user_id: int, amount: int) -> int:
+        return await self.database.credit_coins(user_id, amount)
+
+    async def settle_aacoins(
+        self,
+        deltas: Sequence[tuple[int, int]],
+        reason: db.LedgerReason = db.LedgerReason.game,
+    ) -> dict[int, int]:
+        return await self.database.settle_coins(deltas, reason)
+
     async def set_aacoins(self, user_id: int, amount: int):
         return await self.database.set_coins(user_id, amount)
 
+    async def get_aacoin_ledger(
+        self, user_id: int, limit: int = 10
+    ) -> list[db.LedgerEntry]:
+        return await self.database.get_ledger_entries(user_id, limit)
+
+    async def rebuild_aacoin_balance(self, user_id: int) -> int:
+        return await self.database.rebuild_coin_balance(user_id)
+
+    async def snapshot_aacoins(self) -> int:
+        return await self.database.snapshot_coin_balances()
+
+    async def backup_database(self, path: pathlib.Path) -> dict[str, int]:
+        return await self.database.backup(path)
+
+    async def restore_database(self, path: pathlib.Path) -> dict[str, int]:
+        return await self.database.restore(path)
+
+    def get_database_metrics(self) -> list[db.OperationStats]:
+        return self.database.metrics_snapshot()
+
+    def reset_database_metrics(self):
+        self.database.metrics.reset()
+
     async def set_cooldown(self, command_name, user_id):
         return await self.database.set_cooldown(user_id, command_name)
 
     async def clear_cooldowns(self):
         return await self.database.clear_all_cooldowns()
 
+    async def prune_cooldowns(self, batch_size: int = 500) -> int:
+        return await self.database.prune_cooldowns(batch_size)
+
     async def clear_cooldowns_for_user(self, user_id: int):
         return await self.database.clear_cooldowns_for_user(user_id)
 
@@ -170,5 +406,8 @@ class ArcanumBot(commands.Bot):
     async def set_purple_heart(self, user_id: int):
         return await self.database.set_purple_heart(user_id)
 
+    async def claim_purple_heart(self, user_id: int, amount: int) -> bool:
+        return await self.database.claim_purple_heart(user_id, amount)
+
     async def is_purple_heart(self, user_id) -> bool:
         return await self.database.is_purple_heart(user_id)
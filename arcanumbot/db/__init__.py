@@ -0,0 +1,33 @@
+from .base import (
+    LEDGER_COLUMNS,
+    OVERFLOW_MESSAGE,
+    Backend,
+    CoinsEntry,
+    LedgerEntry,
+    LedgerReason,
+)
+from .database import (
+    COOLDOWN_RESET_HOUR,
+    COOLDOWN_TIMEZONE,
+    DEFAULT_FLUSH_INTERVAL,
+    DEFAULT_FLUSH_SIZE,
+    BalanceIndex,
+    CoinRank,
+    Database,
+    current_game_day,
+    next_cooldown_reset,
+)
+from .memory import MemoryBackend
+from .metrics import OperationStats, QueryMetrics
+from .postgres import (
+    DEFAULT_MAX_INACTIVE_CONNECTION_LIFETIME,
+    DEFAULT_POOL_MAX_SIZE,
+    DEFAULT_POOL_MIN_SIZE,
+    DEFAULT_STATEMENT_CACHE_SIZE,
+    PostgresBackend,
+)
+from .sqlite import DEFAULT_SQLITE_PATH, SQLiteBackend
+
+BACKENDS = {
+    backend.name: backend for backend in (PostgresBackend, SQLiteBackend, MemoryBackend)
+}
@@ -0,0 +1,235 @@
+import abc
+import enum
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple, Optional, Sequence
+
+from discord.ext.commands import CommandError
+
+if TYPE_CHECKING:
+    from .metrics import QueryMetrics
+
+OVERFLOW_MESSAGE = (
+    "New balance would be over int64, are you sure you need that many coins?"
+)
+
+
+class CoinsEntry(NamedTuple):
+    user_id: int
+    coins: int
+
+
+class LedgerReason(str, enum.Enum):
+    add = "add"
+    remove = "remove"
+    set = "set"
+    game = "game"
+    delete = "delete"
+    purple_heart = "purple_heart"
+    restore = "restore"
+
+
+class LedgerEntry(NamedTuple):
+    user_id: int
+    delta: int
+    # balance right after this delta was applied
+    balance: int
+    reason: str
+    created_at: datetime
+
+
+LEDGER_COLUMNS = list(LedgerEntry._fields)
+
+# the state a backup covers, the ledger is an audit log and isn't part of it
+BACKUP_TABLES = ("coins", "cooldowns", "purple_hearts")
+
+
+class Migration(NamedTuple):
+    # applied in ascending order, each version runs exactly once
+    version: int
+    name: str
+    sql: str
+
+
+def pending_migrations(
+    migrations: Sequence[Migration], applied: set[int]
+) -> list[Migration]:
+    """
+    Get the migrations that haven't been applied yet, in the order they must run
+
+    :param migrations: Every migration the backend knows about
+    :param applied: Versions already recorded as applied
+    """
+    versions = [migration.version for migration in migrations]
+
+    if versions != list(range(1, len(versions) + 1)):
+        raise RuntimeError(f"Migration versions must be numbered 1..n, got {versions}")
+
+    return [migration for migration in migrations if migration.version not in applied]
+
+
+def check_int64(*values: int):
+    """
+    Raise the overflow error if any value doesn't fit in a BIGINT
+    """
+    if any(value.bit_length() >= 64 for value in values):
+        raise CommandError(OVERFLOW_MESSAGE)
+
+
+class Backend(abc.ABC):
+    """
+    Storage for the bot's state
+
+    Every backend must behave the same; Database layers its caches on top
+    and only talks to storage through these methods
+    """
+
+    name: str
+    # set by Database, backends report connection wait time to it
+    metrics: Optional["QueryMetrics"] = None
+
+    @abc.abstractmethod
+    async def connect(self):
+        """
+        Open the connection and create any missing tables
+        """
+
+    @abc.abstractmethod
+    async def close(self):
+        pass
+
+    async def warm_up(self):
+        """
+        Get connections and caches ready before the first real query, optional
+        """
+
+    @abc.abstractmethod
+    async def fetch_balance(self, user_id: int) -> Optional[int]:
+        """
+        :return: The balance or None if the user has no account
+        """
+
+    @abc.abstractmethod
+    async def fetch_all_balances(self) -> list[CoinsEntry]:
+        pass
+
+    @abc.abstractmethod
+    async def set_balance(self, user_id: int, amount: int) -> Optional[int]:
+        """
+        :return: The previous balance or None if the account was created
+        """
+
+    @abc.abstractmethod
+    async def apply_deltas(self, deltas: Sequence[tuple[int, int]]) -> dict[int, int]:
+        """
+        Atomically add (user_id, delta) pairs to balances, creating accounts as needed
+
+        Raises CommandError if any balance would overflow, in which case nothing is applied
+
+        :return: The new balance of every account touched
+        """
+
+    @abc.abstractmethod
+    async def delete_accounts(self, user_ids: Sequence[int]) -> list[CoinsEntry]:
+        """
+        :return: The deleted accounts and the balances they had
+        """
+
+    @abc.abstractmethod
+    async def leaderboard_after(
+        self, after: Optional[CoinsEntry], limit: int
+    ) -> list[CoinsEntry]:
+        """
+        :param after: The last entry of the previous page, None to start at the top
+        """
+
+    @abc.abstractmethod
+    async def leaderboard_before(
+        self, before: Optional[CoinsEntry], limit: int
+    ) -> list[CoinsEntry]:
+        """
+        :param before: The first entry of the next page, None to start at the bottom
+        """
+
+    @abc.abstractmethod
+    async def fetch_cooldowns(self, min_game_day: int) -> dict[tuple[str, int], int]:
+        """
+        :return: (command_name, user_id) -> game_day for cooldowns set on or after min_game_day
+        """
+
+    @abc.abstractmethod
+    async def set_cooldown(self, command_name: str, user_id: int, game_day: int):
+        pass
+
+    @abc.abstractmethod
+    async def clear_cooldowns(self, user_id: Optional[int] = None):
+        """
+        :param user_id: Only clear this user's cooldowns, None clears all of them
+        """
+
+    @abc.abstractmethod
+    async def prune_cooldowns(self, before_game_day: int, limit: int) -> int:
+        """
+        :return: Number of cooldowns deleted
+        """
+
+    @abc.abstractmethod
+    async def add_purple_heart(self, user_id: int):
+        pass
+
+    @abc.abstractmethod
+    async def has_purple_heart(self, user_id: int) -> bool:
+        pass
+
+    @abc.abstractmethod
+    async def claim_purple_heart(self, user_id: int, amount: int) -> Optional[int]:
+        """
+        Atomically record the purple heart and credit amount if the user didn't have it yet
+
+        :return: The new balance, or None if the heart was already claimed
+        """
+
+    @abc.abstractmethod
+    async def write_ledger(self, entries: Sequence[LedgerEntry]):
+        """
+        Append entries to the ledger in order
+        """
+
+    @abc.abstractmethod
+    async def snapshot_balances(self, balances: dict[int, int]) -> int:
+        """
+        Replace each account's snapshot with its current balance at its latest ledger entry
+
+        Only the latest snapshot is kept so rebuilds never read older ones
+
+        :param balances: user_id -> balance, matching every ledger entry written so far
+        :return: Number of snapshots written
+        """
+
+    @abc.abstractmethod
+    async def rebuild_balance(self, user_id: int) -> int:
+        """
+        Rebuild a balance from the latest snapshot plus the ledger entries after it
+        """
+
+    @abc.abstractmethod
+    async def fetch_ledger(self, user_id: int, limit: int) -> list[LedgerEntry]:
+        """
+        :return: The user's most recent ledger entries, newest first
+        """
+
+    async def backup(self, path: Path) -> dict[str, int]:
+        """
+        Write every table in BACKUP_TABLES to a compressed archive
+
+        :return: Number of rows written per table
+        """
+        raise CommandError(f"The {self.name} backend doesn't support backups")
+
+    async def restore(self, path: Path) -> dict[str, int]:
+        """
+        Replace every table in BACKUP_TABLES with the contents of a backup, all or nothing
+
+        :return: Number of rows restored per table
+        """
+        raise CommandError(f"The {self.name} backend doesn't support backups")
@@ -0,0 +1,864 @@
+import asyncio
+import bisect
+import logging
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    NamedTuple,
+    Optional,
+    Sequence,
+)
+from zoneinfo import ZoneInfo
+
+from discord.ext.commands import CommandError
+
+from .base import (
+    Backend,
+    CoinsEntry,
+    LedgerEntry,
+    LedgerReason,
+    check_int64,
+)
+from .metrics import OperationStats, QueryMetrics, instrumented
+from .postgres import PostgresBackend
+
+if TYPE_CHECKING:
+    from ..bot import ArcanumBot
+
+
+logger = logging.getLogger(__name__)
+
+
+class CoinRank(NamedTuple):
+    # 1 is the richest account
+    position: int
+    total: int
+    balance: int
+    above: Optional[CoinsEntry]
+    below: Optional[CoinsEntry]
+
+    @property
+    def percentile(self) -> float:
+        """
+        Percentage of accounts with a lower leaderboard position
+        """
+        return 100 * (self.total - self.position) / self.total
+
+
+class BalanceIndex:
+    """
+    Sorted in-memory index of every coin balance for O(log n) rank lookups
+
+    Keys are (-coins, user_id) so the list is in leaderboard order. The bot is
+    the only writer to the coins table so it also serves balance reads, as long
+    as every write goes through update or remove
+    """
+
+    def __init__(self):
+        self._keys: list[tuple[int, int]] = []
+        self._balances: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def load(self, entries: Sequence[CoinsEntry]):
+        self._balances = {entry.user_id: entry.coins for entry in entries}
+        self._keys = sorted(
+            (-coins, user_id) for user_id, coins in self._balances.items()
+        )
+
+    def balance(self, user_id: int) -> int:
+        return self._balances.get(user_id, 0)
+
+    def balances(self) -> dict[int, int]:
+        return dict(self._balances)
+
+    def update(self, user_id: int, balance: int):
+        self.remove(user_id)
+        self._balances[user_id] = balance
+        bisect.insort(self._keys, (-balance, user_id))
+
+    def remove(self, user_id: int):
+        balance = self._balances.pop(user_id, None)
+
+        if balance is not None:
+            position = bisect.bisect_left(self._keys, (-balance, user_id))
+            del self._keys[position]
+
+    def _entry(self, position: int) -> Optional[CoinsEntry]:
+        if 0 <= position < len(self._keys):
+            negative_coins, user_id = self._keys[position]
+            return CoinsEntry(user_id, -negative_coins)
+
+        return None
+
+    def rank(self, user_id: int) -> Optional[CoinRank]:
+        balance = self._balances.get(user_id)
+
+        if balance is None:
+            return None
+
+        position = bisect.bisect_left(self._keys, (-balance, user_id))
+        return CoinRank(
+            position=position + 1,
+            total=len(self._keys),
+            balance=balance,
+            above=self._entry(position - 1),
+            below=self._entry(position + 1),
+        )
+
+
+COOLDOWN_TIMEZONE = "America/Chicago"
+COOLDOWN_ZONE = ZoneInfo(COOLDOWN_TIMEZONE)
+# cooldowns reset at 23:00 chicago time
+COOLDOWN_RESET_HOUR = 23
+
+
+def current_game_day() -> int:
+    """
+    Get the number of the current game day, a new one starts at every cooldown reset
+    """
+    # shifted in utc so the hours are real ones even across a dst change
+    shifted = datetime.now(timezone.utc) + timedelta(hours=24 - COOLDOWN_RESET_HOUR)
+    return shifted.astimezone(COOLDOWN_ZONE).date().toordinal()
+
+
+def next_cooldown_reset() -> datetime:
+    now = datetime.now(COOLDOWN_ZONE)
+    reset = now.replace(hour=COOLDOWN_RESET_HOUR, minute=0, second=0, microsecond=0)
+
+    if reset <= now:
+        # aware arithmetic keeps the wall clock time, like the reset itself
+        reset += timedelta(days=1)
+
+    return reset
+
+
+DEFAULT_FLUSH_INTERVAL = 0.005
+DEFAULT_FLUSH_SIZE = 100
+LEDGER_FLUSH_INTERVAL = 1
+LEDGER_FLUSH_SIZE = 500
+
+
+def _fail_waiters(futures: list[asyncio.Future], exc: BaseException):
+    for future in futures:
+        if not future.done():
+            future.set_exception(exc)
+
+
+class Database:
+    def __init__(
+        self,
+        *,
+        backend: Optional[Backend] = None,
+        write_behind: bool = False,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        flush_size: int = DEFAULT_FLUSH_SIZE,
+    ):
+        """
+        :param backend: Where state is stored, defaults to postgres
+        :param write_behind: Buffer coin deltas and write them in batches
+        :param flush_interval: Seconds a buffered delta can wait before being written
+        :param flush_size: Number of buffered accounts that triggers an early write
+        """
+        self.backend: Backend = backend or PostgresBackend()
+        self.metrics = QueryMetrics()
+        self.backend.metrics = self.metrics
+        self._connected: bool = False
+        self._connection_lock = asyncio.Lock()
+        self.balance_index = BalanceIndex()
+        # (command_name, user_id) -> game_day mirrored from the cooldowns table
+        self._cooldowns: dict[tuple[str, int], int] = {}
+        # writes that don't need to block the caller, persisted in order by _write_worker
+        self._write_queue: asyncio.Queue[
+            tuple[Callable[..., Awaitable[Any]], tuple]
+        ] = asyncio.Queue()
+        self._write_worker: Optional[asyncio.Task] = None
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        # user_id -> summed delta and the callers waiting on it
+        self._pending_deltas: dict[int, int] = {}
+        self._pending_waiters: dict[int, list[asyncio.Future[int]]] = {}
+        # every buffered delta in request order, for the ledger
+        self._pending_entries: list[tuple[int, int, LedgerReason]] = []
+        self._flush_full = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flush_timer: Optional[asyncio.Task] = None
+        # ledger rows waiting to be written by _ledger_worker
+        self._ledger_buffer: list[LedgerEntry] = []
+        self._ledger_full = asyncio.Event()
+        self._ledger_lock = asyncio.Lock()
+        self._ledger_worker: Optional[asyncio.Task] = None
+        # accounts whose snapshot is behind their balance
+        self._unsnapshotted: set[int] = set()
+
+    async def connect(self) -> Backend:
+        # every method calls this so once connected it shouldn't cost a lock round trip
+        if self._connected:
+            return self.backend
+
+        async with self._connection_lock:
+            if self._connected:
+                return self.backend
+
+            async with self.metrics.measure("connect"):
+                await self.backend.connect()
+                logger.info(f"Connected to the {self.backend.name} backend")
+
+                await self.backend.warm_up()
+                await self._load_cooldowns()
+                await self._load_balance_index()
+
+            self._write_worker = asyncio.create_task(self._run_write_worker())
+            self._ledger_worker = asyncio.create_task(self._run_ledger_worker())
+            # only set once everything is loaded since the fast path skips the lock
+            self._connected = True
+            return self.backend
+
+    async def close(self):
+        """
+        Flush any queued writes and close the backend
+        """
+        if not self._connected:
+            return
+
+        await self.flush()
+        await self._write_queue.join()
+        await self.flush_ledger()
+
+        if self._write_worker is not None:
+            self._write_worker.cancel()
+            self._write_worker = None
+
+        if self._ledger_worker is not None:
+            self._ledger_worker.cancel()
+            self._ledger_worker = None
+
+        await self.backend.close()
+        self._connected = False
+
+    async def _load_cooldowns(self):
+        self._cooldowns = await self.backend.fetch_cooldowns(current_game_day())
+        logger.info(f"Loaded {len(self._cooldowns)} cooldowns")
+
+    async def _load_balance_index(self):
+        self.balance_index.load(await self.backend.fetch_all_balances())
+        # ledger rows lost to a crash would skew rebuilds, snapshotting every
+        # account from the coins table puts them back in line
+        self._unsnapshotted.update(self.balance_index.balances())
+        logger.info(f"Loaded {len(self.balance_index)} balances into the rank index")
+
+    def metrics_snapshot(self) -> list[OperationStats]:
+        """
+        Get call counts, latency percentiles and pool wait time for every operation
+        """
+        return self.metrics.snapshot()
+
+    def _record_balance(self, user_id: int, balance: int):
+        self.balance_index.update(user_id, balance)
+
+    def _forget_account(self, user_id: int):
+        self.balance_index.remove(user_id)
+
+    async def _run_write_worker(self):
+        while True:
+            write, args = await self._write_queue.get()
+
+            try:
+                async with self.metrics.measure(f"queued {write.__name__}"):
+                    await write(*args)
+            except Exception:
+                logger.exception(
+                    f"Failed to persist queued write {write.__name__} {args}"
+                )
+            finally:
+                self._write_queue.task_done()
+
+    def _queue_write(self, write: Callable[..., Awaitable[Any]], *args):
+        self._write_queue.put_nowait((write, args))
+
+    def _log_deltas(
+        self,
+        entries: Sequence[tuple[int, int, LedgerReason]],
+        balances: dict[int, int],
+    ):
+        """
+        Buffer ledger rows for deltas that were just written
+
+        :param entries: (user_id, delta, reason) in the order they were applied
+        :param balances: The balance of each account after all of its entries
+        """
+        now = datetime.now(timezone.utc)
+        running = dict(balances)
+        rows = []
+
+        # walk backwards so each row gets the balance right after its own delta
+        for user_id, delta, reason in reversed(entries):
+            if user_id not in running:
+                continue
+
+            rows.append(
+                LedgerEntry(user_id, delta, running[user_id], reason.value, now)
+            )
+            running[user_id] -= delta
+
+        rows.reverse()
+        self._ledger_buffer.extend(rows)
+        self._unsnapshotted.update(row.user_id for row in rows)
+
+        if len(self._ledger_buffer) >= LEDGER_FLUSH_SIZE:
+            self._ledger_full.set()
+
+    async def _run_ledger_worker(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._ledger_full.wait(), LEDGER_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+            try:
+                await self.flush_ledger()
+            except Exception:
+                logger.exception("Failed to flush the coin ledger")
+
+    async def _flush_ledger(self):
+        # must be called with _ledger_lock held
+        rows, self._ledger_buffer = self._ledger_buffer, []
+        self._ledger_full.clear()
+
+        if not rows:
+            return
+
+        try:
+            await self.backend.write_ledger(rows)
+        except Exception:
+            # put them back so they are retried with the next batch
+            self._ledger_buffer[:0] = rows
+            raise
+
+    @instrumented
+    async def flush_ledger(self):
+        """
+        Write all buffered ledger rows to the coin_ledger table
+        """
+        await self.connect()
+
+        async with self._ledger_lock:
+            await self._flush_ledger()
+
+    @instrumented
+    async def snapshot_coin_balances(self) -> int:
+        """
+        Snapshot the balance of every account that changed since its last snapshot
+
+        Balances come from the rank index rather than summing the ledger, so rows
+        that never made it into the ledger don't carry over into later rebuilds
+
+        :return: Number of snapshot rows written
+        """
+        await self.connect()
+
+        # holding the ledger lock means no rows are written while the snapshot is taken
+        async with self._ledger_lock:
+            # the index and the ledger buffer are updated in the same step, so these
+            # balances match exactly the rows the flush below writes
+            balances = {
+                user_id: self.balance_index.balance(user_id)
+                for user_id in self._unsnapshotted
+            }
+            self._unsnapshotted = set()
+
+            try:
+                await self._flush_ledger()
+                written = await self.backend.snapshot_balances(balances)
+            except Exception:
+                self._unsnapshotted.update(balances)
+                raise
+
+        logger.info(f"Wrote {written} coin snapshots")
+        return written
+
+    @instrumented
+    async def rebuild_coin_balance(self, user_id: int) -> int:
+        """
+        Rebuild a balance from the user's latest snapshot and the ledger rows after it
+        """
+        await self.flush_ledger()
+        return await self.backend.rebuild_balance(user_id)
+
+    @instrumented
+    async def get_ledger_entries(
+        self, user_id: int, limit: int = 10
+    ) -> list[LedgerEntry]:
+        """
+        Get a user's most recent ledger rows, newest first
+        """
+        await self.flush_ledger()
+        return await self.backend.fetch_ledger(user_id, limit)
+
+    def _buffer_delta(
+        self, user_id: int, delta: int, reason: LedgerReason
+    ) -> asyncio.Future[int]:
+        future = asyncio.get_running_loop().create_future()
+
+        self._pending_deltas[user_id] = self._pending_deltas.get(user_id, 0) + delta
+        self._pending_waiters.setdefault(user_id, []).append(future)
+        self._pending_entries.append((user_id, delta, reason))
+
+        if len(self._pending_deltas) >= self.flush_size:
+            self._flush_full.set()
+
+        if self._flush_timer is None:
+            self._flush_timer = asyncio.create_task(self._flush_after_interval())
+
+        return future
+
+    async def _flush_after_interval(self):
+        try:
+            await asyncio.wait_for(self._flush_full.wait(), self.flush_interval)
+        except asyncio.TimeoutError:
+            pass
+
+        # deltas buffered from here on start a new timer
+        self._flush_timer = None
+        await self.flush()
+
+    @instrumented
+    async def flush(self):
+        """
+        Write out all buffered coin deltas in a single statement
+
+        Callers waiting on a buffered delta get the balance after the write
+        """
+        async with self._flush_lock:
+            if not self._pending_deltas:
+                return
+
+            deltas, waiters = self._pending_deltas, self._pending_waiters
+            entries = self._pending_entries
+            self._pending_deltas, self._pending_waiters = {}, {}
+            self._pending_entries = []
+            self._flush_full.clear()
+
+            try:
+                balances = await self._write_deltas(list(deltas.items()))
+            except CommandError:
+                # an account would overflow, write them one by one so only its callers fail
+                balances = {}
+                for user_id, delta in deltas.items():
+                    try:
+                        written = await self._write_deltas([(user_id, delta)])
+                    except Exception as exc:
+                        _fail_waiters(waiters.pop(user_id), exc)
+                        continue
+
+                    # logged right away so the ledger never trails the rank index
+                    # across an await, snapshots rely on that
+                    self._log_deltas(
+                        [entry for entry in entries if entry[0] == user_id], written
+                    )
+                    balances.update(written)
+            except Exception as exc:
+                for futures in waiters.values():
+                    _fail_waiters(futures, exc)
+                return
+            else:
+                self._log_deltas(entries, balances)
+
+            for user_id, futures in waiters.items():
+                for future in futures:
+                    if not future.done():
+                        future.set_result(balances[user_id])
+
+    @instrumented
+    async def backup(self, path: Path) -> dict[str, int]:
+        """
+        Write coins, cooldowns and purple hearts to a compressed archive
+
+        :param path: Where to write the archive
+        :return: Number of rows written per table
+        """
+        await self.connect()
+
+        # everything callers were already told about has to be in the backup
+        await self.flush()
+        await self._write_queue.join()
+
+        counts = await self.backend.backup(path)
+        logger.info(f"Backed up {counts} to {path}")
+        return counts
+
+    @instrumented
+    async def restore(self, path: Path) -> dict[str, int]:
+        """
+        Replace coins, cooldowns and purple hearts with the contents of a backup
+
+        :param path: The archive to restore
+        :return: Number of rows restored per table
+        """
+        await self.connect()
+
+        await self.flush()
+        await self._write_queue.join()
+        previous = self.balance_index.balances()
+
+        # holding the flush lock keeps buffered deltas from landing mid restore
+        async with self._flush_lock:
+            counts = await self.backend.restore(path)
+
+            await self._load_cooldowns()
+            await self._load_balance_index()
+
+        # the ledger has to agree with the restored balances for rebuilds to work
+        restored = self.balance_index.balances()
+        changes = [
+            (user_id, restored.get(user_id, 0) - previous.get(user_id, 0))
+            for user_id in previous.keys() | restored.keys()
+        ]
+        changes = [(user_id, delta) for user_id, delta in changes if delta != 0]
+        self._log_deltas(
+            [(user_id, delta, LedgerReason.restore) for user_id, delta in changes],
+            {user_id: restored.get(user_id, 0) for user_id, _ in changes},
+        )
+
+        logger.info(f"Restored {counts} from {path}")
+        return counts
+
+    @instrumented
+    async def sync_coins_to_discord(self, bot: "ArcanumBot"):
+        """
+        Drop the coin accounts of users who are no longer in the guild
+        """
+        await self.connect()
+        guild = bot.guild
+
+        coin_rows = await self.backend.fetch_all_balances()
+
+        departed: list[int] = []
+        ambiguous: list[int] = []
+
+        for user_id, _ in coin_rows:
+            if guild.get_member(user_id) is not None:
+                continue
+
+            # a chunked guild has every member cached so a miss means they left
+            if guild.chunked:
+                departed.append(user_id)
+            else:
+                ambiguous.append(user_id)
+
+        for user_id in ambiguous:
+            if await bot.resolve_member(user_id) is None:
+                departed.append(user_id)
+
+        logger.info(
+            f"Coin sync checked {len(coin_rows)} accounts; "
+            f"{len(ambiguous)} needed fetching, {len(departed)} departed"
+        )
+
+        if not departed:
+            return
+
+        dropped = await self.delete_coin_accounts(departed)
+
+        for entry in dropped:
+            logger.info(
+                f"Dropped departed account {entry.user_id} from coin db; had {entry.coins} coins"
+            )
+
+        summary = (
+            f"Dropped {len(dropped)} departed accounts from coin db; "
+            f"they had {sum(entry.coins for entry in dropped)} coins total"
+        )
+        details = "\n".join(f"{entry.user_id}: {entry.coins}" for entry in dropped)
+
+        # keep under the 2000 character message limit
+        if len(summary) + len(details) < 1900:
+            summary += f"\n{details}"
+
+        await bot.logging_channel.send(summary)
+
+    @instrumented
+    async def delete_coin_account(self, user_id: int) -> Optional[int]:
+        """
+        Delete a coin account in one statement
+
+        :param user_id: The account to delete
+        :return: The balance it had, or None if there was no account
+        """
+        # buffered deltas have to land first or they would recreate the account
+        await self.flush()
+        await self.connect()
+
+        deleted = await self.backend.delete_accounts([user_id])
+        self._forget_account(user_id)
+
+        if not deleted:
+            return None
+
+        balance = deleted[0].coins
+        self._log_deltas([(user_id, -balance, LedgerReason.delete)], {user_id: 0})
+
+        logger.info(f"Deleted coin account {user_id}; it had {balance} coins")
+        return balance
+
+    @instrumented
+    async def delete_coin_accounts(self, user_ids: Sequence[int]) -> list[CoinsEntry]:
+        """
+        Delete several coin accounts in one statement
+
+        :param user_ids: The accounts to delete
+        :return: The deleted accounts and the balances they had
+        """
+        await self.flush()
+        await self.connect()
+
+        deleted = await self.backend.delete_accounts(user_ids)
+
+        for user_id in user_ids:
+            self._forget_account(user_id)
+
+        self._log_deltas(
+            [(entry.user_id, -entry.coins, LedgerReason.delete) for entry in deleted],
+            {entry.user_id: 0 for entry in deleted},
+        )
+
+        logger.info(f"Deleted {len(deleted)} coin accounts")
+        return deleted
+
+    @instrumented
+    async def get_coin_balance(self, user_id: int) -> int:
+        # the rank index holds every account so this needs no query
+        await self.connect()
+        return self.balance_index.balance(user_id)
+
+    @instrumented
+    async def get_all_coin_balances(self) -> list[CoinsEntry]:
+        await self.connect()
+
+        entries = await self.backend.fetch_all_balances()
+        return sorted(entries, key=lambda entry: entry.coins, reverse=True)
+
+    @instrumented
+    async def count_coin_accounts(self) -> int:
+        # the rank index holds every account so this needs no query
+        await self.connect()
+        return len(self.balance_index)
+
+    @instrumented
+    async def get_coin_rank(self, user_id: int) -> Optional[CoinRank]:
+        """
+        Get a user's leaderboard position from the in-memory rank index
+
+        :param user_id: The user to look up
+        :return: The rank or None if the user has no coin account
+        """
+        await self.connect()
+        return self.balance_index.rank(user_id)
+
+    @instrumented
+    async def get_leaderboard_after(
+        self, after: Optional[CoinsEntry], limit: int
+    ) -> list[CoinsEntry]:
+        """
+        Get a page of the leaderboard ordered by coins descending
+
+        :param after: The last entry of the previous page, None to start at the top
+        :param limit: Max number of entries to return
+        """
+        await self.connect()
+        return await self.backend.leaderboard_after(after, limit)
+
+    @instrumented
+    async def get_leaderboard_before(
+        self, before: Optional[CoinsEntry], limit: int
+    ) -> list[CoinsEntry]:
+        """
+        Get a page of the leaderboard ordered by coins descending
+
+        :param before: The first entry of the next page, None to start at the bottom
+        :param limit: Max number of entries to return
+        """
+        await self.connect()
+        return await self.backend.leaderboard_before(before, limit)
+
+    @instrumented
+    async def set_coins(self, user_id: int, amount: int):
+        # buffered deltas were requested before this so they have to land first
+        await self.flush()
+        await self.connect()
+
+        # the old balance is only needed for the ledger delta
+        previous = await self.backend.set_balance(user_id, amount)
+
+        self._record_balance(user_id, amount)
+        self._log_deltas(
+            [(user_id, amount - (previous or 0), LedgerReason.set)], {user_id: amount}
+        )
+        logger.info(f"Set coin account {user_id} to {amount}.")
+
+    async def _apply_coin_delta(
+        self, user_id: int, delta: int, reason: LedgerReason
+    ) -> int:
+        check_int64(delta)
+
+        if self.write_behind:
+            return await self._buffer_delta(user_id, delta, reason)
+
+        balances = await self._write_deltas([(user_id, delta)])
+        new_balance = balances[user_id]
+
+        self._log_deltas([(user_id, delta, reason)], {user_id: new_balance})
+        logger.info(f"Changed coin account {user_id} by {delta} to {new_balance}.")
+        return new_balance
+
+    @instrumented
+    async def add_coins(self, user_id: int, amount: int) -> int:
+        return await self._apply_coin_delta(user_id, amount, LedgerReason.add)
+
+    @instrumented
+    async def remove_coins(self, user_id: int, amount: int) -> int:
+        return await self._apply_coin_delta(user_id, -amount, LedgerReason.remove)
+
+    @instrumented
+    async def credit_coins(self, user_id: int, amount: int) -> int:
+        """
+        Credit a payout to a user's account
+
+        :param user_id: The user to credit
+        :param amount: The amount to credit
+        :return: The balance after the credit was applied
+        """
+        return await self._apply_coin_delta(user_id, amount, LedgerReason.game)
+
+    @instrumented
+    async def settle_coins(
+        self,
+        deltas: Sequence[tuple[int, int]],
+        reason: LedgerReason = LedgerReason.game,
+    ) -> dict[int, int]:
+        """
+        Apply several balance changes at once; either all of them are applied or none are
+
+        :param deltas: (user_id, delta) pairs, a user may appear more than once
+        :param reason: The ledger reason recorded for every delta
+        :return: A mapping of user_id to balance after settlement
+        """
+        balances = await self._write_deltas(deltas)
+        self._log_deltas(
+            [(user_id, delta, reason) for user_id, delta in deltas], balances
+        )
+
+        logger.info(f"Settled {len(deltas)} coin changes: {balances}")
+        return balances
+
+    async def _write_deltas(self, deltas: Sequence[tuple[int, int]]) -> dict[int, int]:
+        if not deltas:
+            return {}
+
+        await self.connect()
+
+        balances = await self.backend.apply_deltas(deltas)
+        for user_id, balance in balances.items():
+            self._record_balance(user_id, balance)
+
+        return balances
+
+    @instrumented
+    async def set_cooldown(self, user_id: int, command_name: str):
+        await self.connect()
+
+        game_day = current_game_day()
+        self._cooldowns[(command_name, user_id)] = game_day
+        self._queue_write(self.backend.set_cooldown, command_name, user_id, game_day)
+
+        logger.info(f"Set cooldown for {user_id} for command {command_name}")
+
+    @instrumented
+    async def clear_all_cooldowns(self):
+        await self.connect()
+
+        self._cooldowns.clear()
+        self._queue_write(self.backend.clear_cooldowns)
+
+        logger.info("All cooldowns cleared")
+
+    @instrumented
+    async def clear_cooldowns_for_user(self, user_id: int):
+        await self.connect()
+
+        self._cooldowns = {
+            key: game_day
+            for key, game_day in self._cooldowns.items()
+            if key[1] != user_id
+        }
+        self._queue_write(self.backend.clear_cooldowns, user_id)
+
+        logger.info(f"Reset cooldowns for {user_id}")
+
+    @instrumented
+    async def is_on_cooldown(self, command_name: str, user_id: int) -> bool:
+        # connect loads the cooldowns so this is only a dict lookup after startup
+        await self.connect()
+        return self._cooldowns.get((command_name, user_id)) == current_game_day()
+
+    @instrumented
+    async def prune_cooldowns(self, batch_size: int = 500) -> int:
+        """
+        Delete one batch of cooldowns from previous game days
+
+        Expired cooldowns are already ignored by is_on_cooldown, this only
+        keeps the table from growing
+
+        :param batch_size: Max number of rows to delete
+        :return: Number of rows deleted
+        """
+        await self.connect()
+        game_day = current_game_day()
+
+        self._cooldowns = {
+            key: day for key, day in self._cooldowns.items() if day >= game_day
+        }
+
+        deleted = await self.backend.prune_cooldowns(game_day, batch_size)
+        logger.info(f"Pruned {deleted} expired cooldowns")
+        return deleted
+
+    @instrumented
+    async def set_purple_heart(self, user_id: int):
+        await self.connect()
+        await self.backend.add_purple_heart(user_id)
+
+        logger.info(f"Set purple heart for {user_id}")
+
+    @instrumented
+    async def claim_purple_heart(self, user_id: int, amount: int) -> bool:
+        """
+        Give a user their purple heart and its reward, at most once per user
+
+        :param user_id: The user claiming
+        :param amount: The coins credited with a new claim
+        :return: True if this was a new claim
+        """
+        await self.connect()
+        balance = await self.backend.claim_purple_heart(user_id, amount)
+
+        if balance is None:
+            return False
+
+        self._record_balance(user_id, balance)
+        self._log_deltas(
+            [(user_id, amount, LedgerReason.purple_heart)], {user_id: balance}
+        )
+        logger.info(f"{user_id} claimed their purple heart for {amount} coins")
+        return True
+
+    @instrumented
+    async def is_purple_heart(self, user_id: int):
+        await self.connect()
+        return await self.backend.has_purple_heart(user_id)
@@ -0,0 +1,174 @@
+from typing import Optional, Sequence
+
+from .base import Backend, CoinsEntry, LedgerEntry, check_int64
+
+
+class MemoryBackend(Backend):
+    """
+    Keeps everything in dicts, nothing survives a restart
+
+    Meant for local development and trying the bot without a database server
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        self._coins: dict[int, int] = {}
+        self._cooldowns: dict[tuple[str, int], int] = {}
+        self._purple_hearts: set[int] = set()
+        # a row's ledger id is its index + 1
+        self._ledger: list[LedgerEntry] = []
+        # user_id -> (ledger_id, coins) of their latest snapshot
+        self._snapshots: dict[int, tuple[int, int]] = {}
+
+    async def connect(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def fetch_balance(self, user_id: int) -> Optional[int]:
+        return self._coins.get(user_id)
+
+    async def fetch_all_balances(self) -> list[CoinsEntry]:
+        return [CoinsEntry(user_id, coins) for user_id, coins in self._coins.items()]
+
+    async def set_balance(self, user_id: int, amount: int) -> Optional[int]:
+        previous = self._coins.get(user_id)
+        self._coins[user_id] = amount
+        return previous
+
+    async def apply_deltas(self, deltas: Sequence[tuple[int, int]]) -> dict[int, int]:
+        summed: dict[int, int] = {}
+        for user_id, delta in deltas:
+            summed[user_id] = summed.get(user_id, 0) + delta
+
+        balances = {
+            user_id: self._coins.get(user_id, 0) + delta
+            for user_id, delta in summed.items()
+        }
+        # check everything before writing anything so a failure applies nothing
+        check_int64(*summed.values(), *balances.values())
+
+        self._coins.update(balances)
+        return balances
+
+    async def delete_accounts(self, user_ids: Sequence[int]) -> list[CoinsEntry]:
+        deleted = []
+
+        for user_id in user_ids:
+            coins = self._coins.pop(user_id, None)
+
+            if coins is not None:
+                deleted.append(CoinsEntry(user_id, coins))
+
+        return deleted
+
+    def _leaderboard(self) -> list[CoinsEntry]:
+        return sorted(
+            (CoinsEntry(user_id, coins) for user_id, coins in self._coins.items()),
+            key=lambda entry: (-entry.coins, entry.user_id),
+        )
+
+    async def leaderboard_after(
+        self, after: Optional[CoinsEntry], limit: int
+    ) -> list[CoinsEntry]:
+        entries = self._leaderboard()
+
+        if after is not None:
+            cursor = (-after.coins, after.user_id)
+            entries = [
+                entry for entry in entries if (-entry.coins, entry.user_id) > cursor
+            ]
+
+        return entries[:limit]
+
+    async def leaderboard_before(
+        self, before: Optional[CoinsEntry], limit: int
+    ) -> list[CoinsEntry]:
+        entries = self._leaderboard()
+
+        if before is not None:
+            cursor = (-before.coins, before.user_id)
+            entries = [
+                entry for entry in entries if (-entry.coins, entry.user_id) < cursor
+            ]
+
+        return entries[-limit:] if limit > 0 else []
+
+    async def fetch_cooldowns(self, min_game_day: int) -> dict[tuple[str, int], int]:
+        return {
+            key: game_day
+            for key, game_day in self._cooldowns.items()
+            if game_day >= min_game_day
+        }
+
+    async def set_cooldown(self, command_name: str, user_id: int, game_day: int):
+        self._cooldowns[(command_name, user_id)] = game_day
+
+    async def clear_cooldowns(self, user_id: Optional[int] = None):
+        if user_id is None:
+            self._cooldowns.clear()
+        else:
+            self._cooldowns = {
+                key: game_day
+                for key, game_day in self._cooldowns.items()
+                if key[1] != user_id
+            }
+
+    async def prune_cooldowns(self, before_game_day: int, limit: int) -> int:
+        expired = [
+            key
+            for key, game_day in self._cooldowns.items()
+            if game_day < before_game_day
+        ][:limit]
+
+        for key in expired:
+            del self._cooldowns[key]
+
+        return len(expired)
+
+    async def add_purple_heart(self, user_id: int):
+        self._purple_hearts.add(user_id)
+
+    async def has_purple_heart(self, user_id: int) -> bool:
+        return user_id in self._purple_hearts
+
+    async def claim_purple_heart(self, user_id: int, amount: int) -> Optional[int]:
+        if user_id in self._purple_hearts:
+            return None
+
+        balance = self._coins.get(user_id, 0) + amount
+        check_int64(balance)
+
+        self._purple_hearts.add(user_id)
+        self._coins[user_id] = balance
+        return balance
+
+    async def write_ledger(self, entries: Sequence[LedgerEntry]):
+        self._ledger.extend(entries)
+
+    async def snapshot_balances(self, balances: dict[int, int]) -> int:
+        latest_ids: dict[int, int] = {}
+        for ledger_id, entry in enumerate(self._ledger, start=1):
+            latest_ids[entry.user_id] = ledger_id
+
+        for user_id, coins in balances.items():
+            self._snapshots[user_id] = (latest_ids.get(user_id, 0), coins)
+
+        return len(balances)
+
+    async def rebuild_balance(self, user_id: int) -> int:
+        snapshot_id, coins = self._snapshots.get(user_id, (0, 0))
+
+        return coins + sum(
+            entry.delta
+            for entry in self._ledger[snapshot_id:]
+            if entry.user_id == user_id
+        )
+
+    async def fetch_ledger(self, user_id: int, limit: int) -> list[LedgerEntry]:
+        entries = [
+            entry for entry in reversed(self._ledger) if entry.user_id == user_id
+        ]
+        return entries[:limit]
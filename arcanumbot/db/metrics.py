@@ -0,0 +1,134 @@
+import contextlib
+import contextvars
+import functools
+import time
+from collections import deque
+from typing import Awaitable, Callable, NamedTuple, Optional, TypeVar
+
+# only the most recent samples are kept so percentiles follow current load
+DEFAULT_SAMPLE_SIZE = 1000
+
+# the Database operation running in this task, pool waits are charged to it
+current_operation: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "current_operation", default=None
+)
+
+T = TypeVar("T")
+
+
+def _percentile(samples: list[float], percentile: float) -> float:
+    # samples must be sorted
+    if not samples:
+        return 0.0
+
+    return samples[min(len(samples) - 1, int(len(samples) * percentile / 100))]
+
+
+class OperationStats(NamedTuple):
+    name: str
+    calls: int
+    errors: int
+    # seconds, over the most recent samples
+    p50: float
+    p95: float
+    p99: float
+    max: float
+    # seconds spent waiting for a pool connection
+    wait_p95: float
+    wait_max: float
+
+
+class _Operation:
+    def __init__(self, sample_size: int):
+        self.calls = 0
+        self.errors = 0
+        self.latencies: deque[float] = deque(maxlen=sample_size)
+        self.waits: deque[float] = deque(maxlen=sample_size)
+
+
+class QueryMetrics:
+    """
+    Call counts, errors, latency and pool wait time per Database operation
+    """
+
+    def __init__(self, sample_size: int = DEFAULT_SAMPLE_SIZE):
+        self.sample_size = sample_size
+        self._operations: dict[str, _Operation] = {}
+
+    def _operation(self, name: str) -> _Operation:
+        operation = self._operations.get(name)
+
+        if operation is None:
+            operation = self._operations[name] = _Operation(self.sample_size)
+
+        return operation
+
+    def record(self, name: str, seconds: float, *, error: bool = False):
+        operation = self._operation(name)
+        operation.calls += 1
+        operation.latencies.append(seconds)
+
+        if error:
+            operation.errors += 1
+
+    def record_wait(self, seconds: float):
+        """
+        Record time spent waiting for a connection, charged to the current operation
+        """
+        self._operation(current_operation.get() or "unattributed").waits.append(seconds)
+
+    @contextlib.asynccontextmanager
+    async def measure(self, name: str):
+        token = current_operation.set(name)
+        start = time.perf_counter()
+        error = False
+
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            current_operation.reset(token)
+            self.record(name, time.perf_counter() - start, error=error)
+
+    def snapshot(self) -> list[OperationStats]:
+        """
+        :return: Stats for every operation seen so far, slowest p95 first
+        """
+        stats = []
+
+        for name, operation in self._operations.items():
+            latencies = sorted(operation.latencies)
+            waits = sorted(operation.waits)
+            stats.append(
+                OperationStats(
+                    name=name,
+                    calls=operation.calls,
+                    errors=operation.errors,
+                    p50=_percentile(latencies, 50),
+                    p95=_percentile(latencies, 95),
+                    p99=_percentile(latencies, 99),
+                    max=latencies[-1] if latencies else 0.0,
+                    wait_p95=_percentile(waits, 95),
+                    wait_max=waits[-1] if waits else 0.0,
+                )
+            )
+
+        return sorted(stats, key=lambda entry: entry.p95, reverse=True)
+
+    def reset(self):
+        self._operations.clear()
+
+
+def instrumented(method: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+    """
+    Record a Database method's calls in its metrics, keyed by the method name
+    """
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs) -> T:
+        async with self.metrics.measure(method.__name__):
+            return await method(self, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,542 @@
+import asyncio
+import contextlib
+import logging
+import os
+import pwd
+import shutil
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional, Sequence
+
+import asyncpg
+from discord.ext.commands import CommandError
+
+from .base import (
+    BACKUP_TABLES,
+    LEDGER_COLUMNS,
+    OVERFLOW_MESSAGE,
+    Backend,
+    CoinsEntry,
+    LedgerEntry,
+    Migration,
+    check_int64,
+    pending_migrations,
+)
+
+logger = logging.getLogger(__name__)
+
+
+MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    applied_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY(version)
+);
+""".strip()
+
+# the schema from before migrations existed, safe to run against a database that already has it
+BASELINE = """
+CREATE TABLE IF NOT EXISTS coins (
+    user_id BIGINT NOT NULL,
+    coins	BIGINT NOT NULL,
+    PRIMARY KEY(user_id)
+);
+
+CREATE TABLE IF NOT EXISTS cooldowns (
+    command_name TEXT NOT NULL,
+    user_id BIGINT NOT NULL,
+    game_day INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY(command_name, user_id)
+);
+
+ALTER TABLE cooldowns ADD COLUMN IF NOT EXISTS game_day INTEGER NOT NULL DEFAULT 0;
+
+CREATE TABLE IF NOT EXISTS purple_hearts (
+    user_id BIGINT NOT NULL,
+    PRIMARY KEY(user_id)
+);
+
+CREATE TABLE IF NOT EXISTS coin_ledger (
+    id BIGSERIAL NOT NULL,
+    user_id BIGINT NOT NULL,
+    delta BIGINT NOT NULL,
+    balance BIGINT NOT NULL,
+    reason TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY(id)
+);
+
+CREATE INDEX IF NOT EXISTS coin_ledger_user_idx ON coin_ledger (user_id, id);
+
+CREATE TABLE IF NOT EXISTS coin_snapshots (
+    user_id BIGINT NOT NULL,
+    ledger_id BIGINT NOT NULL,
+    coins BIGINT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY(user_id, ledger_id)
+);
+
+-- balances from before the ledger existed become the first snapshot
+INSERT INTO coin_snapshots (user_id, ledger_id, coins)
+SELECT user_id, 0, coins FROM coins
+WHERE NOT EXISTS (SELECT 1 FROM coin_snapshots)
+AND NOT EXISTS (SELECT 1 FROM coin_ledger);
+""".strip()
+
+# never edit or reorder a shipped migration, add a new one instead
+MIGRATIONS = [
+    Migration(1, "baseline", BASELINE),
+    Migration(
+        2,
+        "coins leaderboard index",
+        "CREATE INDEX IF NOT EXISTS coins_leaderboard_idx ON coins (coins DESC, user_id);",
+    ),
+    Migration(
+        3,
+        "cooldowns user index",
+        "CREATE INDEX IF NOT EXISTS cooldowns_user_idx ON cooldowns (user_id);",
+    ),
+]
+
+
+def _write_archive(source: str, path: Path):
+    with tarfile.open(path, "w:gz") as archive:
+        for table in BACKUP_TABLES:
+            archive.add(os.path.join(source, f"{table}.copy"), arcname=f"{table}.copy")
+
+
+def _extract_archive(path: Path, destination: str):
+    try:
+        with tarfile.open(path, "r:gz") as archive:
+            for table in BACKUP_TABLES:
+                # only the expected names are read so a crafted archive can't write elsewhere
+                member = archive.getmember(f"{table}.copy")
+                source = archive.extractfile(member)
+
+                if source is None:
+                    raise KeyError(member.name)
+
+                with open(os.path.join(destination, member.name), "wb") as fp:
+                    shutil.copyfileobj(source, fp)
+    except (tarfile.TarError, KeyError, OSError) as exc:
+        raise CommandError(f"{path.name} is not a valid backup: {exc}")
+
+
+def get_current_username() -> str:
+    return pwd.getpwuid(os.getuid()).pw_name
+
+
+DATABASE_user = get_current_username()
+DATABASE_name = "arcanumbot"
+DEFAULT_POOL_MIN_SIZE = 2
+DEFAULT_POOL_MAX_SIZE = 10
+DEFAULT_STATEMENT_CACHE_SIZE = 100
+# seconds, 0 keeps idle connections open forever
+DEFAULT_MAX_INACTIVE_CONNECTION_LIFETIME = 300.0
+
+FETCH_BALANCE_QUERY = "SELECT coins FROM coins WHERE user_id = $1;"
+LEADERBOARD_FIRST_PAGE_QUERY = (
+    "SELECT user_id, coins FROM coins ORDER BY coins DESC, user_id LIMIT $1;"
+)
+
+
+class PostgresBackend(Backend):
+    name = "postgres"
+
+    def __init__(
+        self,
+        *,
+        min_size: int = DEFAULT_POOL_MIN_SIZE,
+        max_size: int = DEFAULT_POOL_MAX_SIZE,
+        statement_cache_size: int = DEFAULT_STATEMENT_CACHE_SIZE,
+        max_inactive_connection_lifetime: float = DEFAULT_MAX_INACTIVE_CONNECTION_LIFETIME,
+    ):
+        """
+        :param min_size: Connections opened up front and kept open
+        :param max_size: Max number of connections in the pool
+        :param statement_cache_size: Prepared statements cached per connection, 0 disables the cache
+        :param max_inactive_connection_lifetime: Seconds an idle connection is kept before being closed
+        """
+        self.min_size = min_size
+        self.max_size = max_size
+        self.statement_cache_size = statement_cache_size
+        self.max_inactive_connection_lifetime = max_inactive_connection_lifetime
+        self._pool: Optional[asyncpg.Pool] = None
+
+    @property
+    def pool(self) -> asyncpg.Pool:
+        if self._pool is None:
+            raise RuntimeError("Backend is not connected")
+
+        return self._pool
+
+    @contextlib.asynccontextmanager
+    async def _acquire(self):
+        start = time.perf_counter()
+
+        async with self.pool.acquire() as connection:
+            if self.metrics is not None:
+                self.metrics.record_wait(time.perf_counter() - start)
+
+            yield connection
+
+    async def connect(self):
+        self._pool = await asyncpg.create_pool(
+            user=DATABASE_user,
+            database=DATABASE_name,
+            min_size=self.min_size,
+            max_size=self.max_size,
+            statement_cache_size=self.statement_cache_size,
+            max_inactive_connection_lifetime=self.max_inactive_connection_lifetime,
+        )
+        assert self._pool is not None
+        await self._migrate(self._pool)
+
+    async def warm_up(self):
+        # hold min_size connections at once so each of them gets warmed, not the same one again
+        acquired = await asyncio.gather(
+            *(self.pool.acquire() for _ in range(self.min_size))
+        )
+
+        try:
+            for connection in acquired:
+                # puts the hottest reads in each connection's statement cache
+                await connection.fetchval(FETCH_BALANCE_QUERY, 0)
+                await connection.fetch(LEADERBOARD_FIRST_PAGE_QUERY, 1)
+        finally:
+            for connection in acquired:
+                await self.pool.release(connection)
+
+        logger.info(f"Warmed up {len(acquired)} pool connections")
+
+    async def _migrate(self, pool: asyncpg.Pool):
+        async with pool.acquire() as connection:
+            connection: asyncpg.Connection
+            await connection.execute(MIGRATIONS_TABLE)
+            rows = await connection.fetch("SELECT version FROM schema_migrations;")
+
+            for migration in pending_migrations(
+                MIGRATIONS, {row["version"] for row in rows}
+            ):
+                async with connection.transaction():
+                    # another process starting at the same time may have applied it already
+                    await connection.execute(
+                        "LOCK TABLE schema_migrations IN EXCLUSIVE MODE;"
+                    )
+                    if await connection.fetchval(
+                        "SELECT EXISTS(SELECT 1 FROM schema_migrations WHERE version = $1);",
+                        migration.version,
+                    ):
+                        continue
+
+                    await connection.execute(migration.sql)
+                    await connection.execute(
+                        "INSERT INTO schema_migrations (version, name) VALUES ($1, $2);",
+                        migration.version,
+                        migration.name,
+                    )
+
+                logger.info(f"Applied migration {migration.version}: {migration.name}")
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    async def fetch_balance(self, user_id: int) -> Optional[int]:
+        async with self._acquire() as connection:
+            connection: asyncpg.Connection
+            return await connection.fetchval(FETCH_BALANCE_QUERY, user_id)
+
+    async def fetch_all_balances(self) -> list[CoinsEntry]:
+        async with self._acquire() as connection:
+            connection: asyncpg.Connection
+            rows = await connection.fetch("SELECT user_id, coins FROM coins;")
+
+        return [CoinsEntry(row["user_id"], row["coins"]) for row in rows]
+
+    async def set_balance(self, user_id: int, amount: int) -> Optional[int]:
+        async with self._acquire() as connection:
+            connection: asyncpg.Connection
+            return await connection.fetchval(
+                """
+                WITH previous AS (
+                    SELECT coins FROM coins WHERE user_id = $1 FOR UPDATE
+                )
+                INSERT INTO coins (user_id, coins) VALUES ($1, $2)
+                ON CONFLICT (user_id) DO UPDATE SET coins = EXCLUDED.coins
+                RETURNING (SELECT coins FROM previous);
+                """,
+                user_id,
+                amount,
+            )
+
+    async def apply_deltas(self, deltas: Sequence[tuple[int, int]]) -> dict[int, int]:
+        if not deltas:
+            return {}
+
+        user_ids = [user_id for user_id, _ in deltas]
+        amounts = [delta for _, delta in deltas]
+        check_int64(*amounts)
+
+        async with self._acquire() as connection:
+            connection: asyncpg.Connection
+            try:
+                # the arithmetic happens in postgres so concurrent payouts can't lose updates,
+                # duplicate users are summed first because ON CONFLICT can't touch a row twice
+                rows = await connection.fetch(
+                    """
+                    INSERT INTO coins (user_id, coins)
+                    SELECT user_id, SUM(delta)::BIGINT
+                    FROM unnest($1::BIGINT[], $2::BIGINT[]) AS deltas(user_id, delta)
+                    GROUP BY user_id
+                    ON CONFLICT (user_id) DO UPDATE SET coins = coins.coins + EXCLUDED.coins
+                    RETURNING user_id, coins;
+                    """,
+                    user_ids,
+                    amounts,
+                )
+            except asyncpg.NumericValueOutOfRangeError:
+                raise CommandError(OVERFLOW_MESSAGE)
+
+        return {row["user_id"]: row["coins"] for row in rows}
+
+    async def delete_accounts(self, user_ids: Sequence[int]) -> list[CoinsEntry]:
+        async with self._acquire() as connection:
+            connection: asyncpg.Connection
+            rows = await connection.fetch(
+                "DELETE FROM coins WHERE user_id = ANY($1::BIGINT[]) RETURNING user_id, coins;",
+                list(user_ids),
+            )
+
+        return [CoinsEntry(row["user_id"], row["coins"]) for row in rows]
+
+    async def leaderboard_after(
+        self, after: Optional[CoinsEntry], limit: int
+    ) -> list[CoinsEntry]:
+        async with self._acquire() as connection:
+            connection: asyncpg.Connection
+            if after is None:
+                rows = await connection.fetch(LEADERBOARD_FIRST_PAGE_QUERY, limit)
+            else:
+                # the redundant coins bound lets the index scan start at the cursor
+                rows = await connection.fetch(
+                    "SELECT user_id, coins FROM coins WHERE coins <= $1 AND (coins < $1 OR user_id > $2) ORDER BY coins DESC, user_id LIMIT $3;",
+                    after.coins,
+                    after.user_id,
+                    limit,
+                )
+
+        return [CoinsEntry(row["user_id"], row["coins"]) for row in rows]
+
+    async def leaderboard_before(
+        self, before: Optional[CoinsEntry], limit: int
+    ) -> list[CoinsEntry]:
+        # walk the index backwards then flip the rows back into leaderboard order
+        async with self._acquire() as connection:
+            connection: asyncpg.Connection
+            if before is None:
+                rows = await connection.fetch(
+                    "SELECT user_id, coins FROM coins ORDER BY coins, user_id DESC LIMIT $1;",
+                    limit,
+                )
+            else:
+                rows = await connection.fetch(
+                    "SELECT user_id, coins FROM coins WHERE coins >= $1 AND (coins > $1 OR user_id < $2) ORDER BY coins, user_id DESC LIMIT $3;",
+                    before.coins,
+                    before.user_id,
+                    limit,
+                )
+
+        return [CoinsEntry(row["user_id"], row["coins"]) for row in reversed(rows)]
+
+    async def fetch_cooldowns(self, min_game_day: int) -> dict[tuple[str, int], int]:
+        async with self._acquire() as connection:
+            connection: asyncpg.Connection
+            rows = await connection.fetch(
+                "SELECT command_name, user_id, game_day FROM cooldowns WHERE game_day >= $1;",
+                min_game_day,
+            )
+
+        return {(row["command_name"], row["user_id"]): row["game_day"] for row in rows}
+
+    async def set_cooldown(self, command_name: str, user_id: int, game_day: int):
+        async with self._acquire() as connection:
+            connection: asyncpg.Connection
+            await connection.execute(
+                "INSERT INTO cooldowns (command_name, user_id, game_day) VALUES ($1, $2, $3) ON CONFLICT (command_name, user_id) DO UPDATE SET game_day = EXCLUDED.game_day;",
+                command_name,
+                user_id,
+                game_day,
+            )
+
+    async def clear_cooldowns(self, user_id: Optional[int] = None):
+        async with self._acquire() as connection:
+            connection: asyncpg.Connection
+            if user_id is None:
+                await connection.execute("DELETE FROM cooldowns;")
+            else:
+                await connection.execute(
+                    "DELETE FROM cooldowns WHERE user_id = $1;", user_id
+                )
+
+    async def prune_cooldowns(self, before_game_day: int, limit: int) -> int:
+        async with self._acquire() as connection:
+            connection: asyncpg.Connection
+            result = await connection.execute(
+                "DELETE FROM cooldowns WHERE ctid = ANY(ARRAY(SELECT ctid FROM cooldowns WHERE game_day < $1 LIMIT $2));",
+                before_game_day,
+                limit,
+            )
+
+        # execute returns the status string, e.g. DELETE 500
+        return int(result.split()[-1])
+
+    async def add_purple_heart(self, user_id: int):
+        async with self._acquire() as connection:
+            connection: asyncpg.Connection
+            await connection.execute(
+                "INSERT INTO purple_hearts (user_id) VALUES ($1) ON CONFLICT DO NOTHING;",
+                user_id,
+            )
+
+    async def has_purple_heart(self, user_id: int) -> bool:
+        async with self._acquire() as connection:
+            connection: asyncpg.Connection
+            row = await connection.fetchrow(
+                "SELECT * FROM purple_hearts WHERE user_id = $1;", user_id
+            )
+            return row is not None
+
+    async def claim_purple_heart(self, user_id: int, amount: int) -> Optional[int]:
+        check_int64(amount)
+
+        async with self._acquire() as connection:
+            connection: asyncpg.Connection
+            try:
+                # the credit only happens if the heart insert did, and both share one statement
+                return await connection.fetchval(
+                    """
+                    WITH claimed AS (
+                        INSERT INTO purple_hearts (user_id) VALUES ($1)
+                        ON CONFLICT DO NOTHING
+                        RETURNING user_id
+                    )
+                    INSERT INTO coins (user_id, coins)
+                    SELECT user_id, $2 FROM claimed
+                    ON CONFLICT (user_id) DO UPDATE SET coins = coins.coins + EXCLUDED.coins
+                    RETURNING coins;
+                    """,
+                    user_id,
+                    amount,
+                )
+            except asyncpg.NumericValueOutOfRangeError:
+                raise CommandError(OVERFLOW_MESSAGE)
+
+    async def backup(self, path: Path) -> dict[str, int]:
+        counts = {}
+
+        with tempfile.TemporaryDirectory() as directory:
+            async with self._acquire() as connection:
+                connection: asyncpg.Connection
+                # one snapshot for every table so they agree with each other
+                async with connection.transaction(
+                    isolation="repeatable_read", readonly=True
+                ):
+                    for table in BACKUP_TABLES:
+                        # rows are streamed to disk and never held in memory
+                        result = await connection.copy_from_table(
+                            table,
+                            output=os.path.join(directory, f"{table}.copy"),
+                            format="binary",
+                        )
+                        counts[table] = int(result.split()[-1])
+
+            await asyncio.to_thread(_write_archive, directory, path)
+
+        return counts
+
+    async def restore(self, path: Path) -> dict[str, int]:
+        counts = {}
+
+        with tempfile.TemporaryDirectory() as directory:
+            await asyncio.to_thread(_extract_archive, path, directory)
+
+            async with self._acquire() as connection:
+                connection: asyncpg.Connection
+                async with connection.transaction():
+                    await connection.execute(f"TRUNCATE {', '.join(BACKUP_TABLES)};")
+
+                    for table in BACKUP_TABLES:
+                        result = await connection.copy_to_table(
+                            table,
+                            source=os.path.join(directory, f"{table}.copy"),
+                            format="binary",
+                        )
+                        counts[table] = int(result.split()[-1])
+
+        return counts
+
+    async def write_ledger(self, entries: Sequence[LedgerEntry]):
+        async with self._acquire() as connection:
+            connection: asyncpg.Connection
+            await connection.copy_records_to_table(
+                "coin_ledger", records=entries, columns=LEDGER_COLUMNS
+            )
+
+    async def snapshot_balances(self, balances: dict[int, int]) -> int:
+        if not balances:
+            return 0
+
+        async with self._acquire() as connection:
+            connection: asyncpg.Connection
+            async with connection.transaction():
+                await connection.execute(
+                    "DELETE FROM coin_snapshots WHERE user_id = ANY($1::BIGINT[]);",
+                    list(balances.keys()),
+                )
+                # coin_ledger_user_idx makes each max(id) a single index lookup
+                result = await connection.execute(
+                    """
+                    INSERT INTO coin_snapshots (user_id, ledger_id, coins)
+                    SELECT entry.user_id, COALESCE((SELECT max(id) FROM coin_ledger WHERE user_id = entry.user_id), 0), entry.coins
+                    FROM unnest($1::BIGINT[], $2::BIGINT[]) AS entry(user_id, coins);
+                    """,
+                    list(balances.keys()),
+                    list(balances.values()),
+                )
+
+        # execute returns the status string, e.g. INSERT 0 12
+        return int(result.split()[-1])
+
+    async def rebuild_balance(self, user_id: int) -> int:
+        async with self._acquire() as connection:
+            connection: asyncpg.Connection
+            return await connection.fetchval(
+                """
+                WITH latest AS (
+                    SELECT ledger_id, coins FROM coin_snapshots
+                    WHERE user_id = $1
+                    ORDER BY ledger_id DESC
+                    LIMIT 1
+                )
+                SELECT (COALESCE((SELECT coins FROM latest), 0) + COALESCE(SUM(delta), 0))::BIGINT
+                FROM coin_ledger
+                WHERE user_id = $1 AND id > COALESCE((SELECT ledger_id FROM latest), 0);
+                """,
+                user_id,
+            )
+
+    async def fetch_ledger(self, user_id: int, limit: int) -> list[LedgerEntry]:
+        async with self._acquire() as connection:
+            connection: asyncpg.Connection
+            rows = await connection.fetch(
+                f"SELECT {', '.join(LEDGER_COLUMNS)} FROM coin_ledger WHERE user_id = $1 ORDER BY id DESC LIMIT $2;",
+                user_id,
+                limit,
+            )
+
+        return [LedgerEntry(*row) for row in rows]
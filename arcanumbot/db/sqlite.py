@@ -0,0 +1,423 @@
+import asyncio
+import contextlib
+import logging
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Sequence, Union
+
+try:
+    import aiosqlite
+except ImportError:
+    aiosqlite = None
+
+from .base import (
+    LEDGER_COLUMNS,
+    Backend,
+    CoinsEntry,
+    LedgerEntry,
+    Migration,
+    check_int64,
+    pending_migrations,
+)
+
+logger = logging.getLogger(__name__)
+
+
+MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY(version)
+);
+""".strip()
+
+BASELINE = """
+CREATE TABLE IF NOT EXISTS coins (
+    user_id INTEGER NOT NULL,
+    coins INTEGER NOT NULL,
+    PRIMARY KEY(user_id)
+);
+
+CREATE TABLE IF NOT EXISTS cooldowns (
+    command_name TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    game_day INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY(command_name, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS purple_hearts (
+    user_id INTEGER NOT NULL,
+    PRIMARY KEY(user_id)
+);
+
+CREATE TABLE IF NOT EXISTS coin_ledger (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    delta INTEGER NOT NULL,
+    balance INTEGER NOT NULL,
+    reason TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS coin_ledger_user_idx ON coin_ledger (user_id, id);
+
+CREATE TABLE IF NOT EXISTS coin_snapshots (
+    user_id INTEGER NOT NULL,
+    ledger_id INTEGER NOT NULL,
+    coins INTEGER NOT NULL,
+    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY(user_id, ledger_id)
+);
+
+-- balances from before the ledger existed become the first snapshot
+INSERT INTO coin_snapshots (user_id, ledger_id, coins)
+SELECT user_id, 0, coins FROM coins
+WHERE NOT EXISTS (SELECT 1 FROM coin_snapshots)
+AND NOT EXISTS (SELECT 1 FROM coin_ledger);
+""".strip()
+
+# kept in step with the postgres migrations so both backends have the same indexes
+MIGRATIONS = [
+    Migration(1, "baseline", BASELINE),
+    Migration(
+        2,
+        "coins leaderboard index",
+        "CREATE INDEX IF NOT EXISTS coins_leaderboard_idx ON coins (coins DESC, user_id);",
+    ),
+    Migration(
+        3,
+        "cooldowns user index",
+        "CREATE INDEX IF NOT EXISTS cooldowns_user_idx ON cooldowns (user_id);",
+    ),
+]
+
+DEFAULT_SQLITE_PATH = "arcanumbot.sqlite3"
+
+
+class SQLiteBackend(Backend):
+    """
+    Single file backend for running the bot without a postgres server
+
+    Needs the optional aiosqlite package
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_SQLITE_PATH):
+        if aiosqlite is None:
+            raise RuntimeError(
+                "aiosqlite is required for the sqlite backend, install the sqlite extra"
+            )
+
+        self.path = path
+        self._connection: Optional["aiosqlite.Connection"] = None
+        # one connection is shared so statements and transactions can't interleave
+        self._lock = asyncio.Lock()
+
+    @property
+    def connection(self) -> "aiosqlite.Connection":
+        if self._connection is None:
+            raise RuntimeError("Backend is not connected")
+
+        return self._connection
+
+    @contextlib.asynccontextmanager
+    async def _locked(self):
+        start = time.perf_counter()
+
+        async with self._lock:
+            if self.metrics is not None:
+                self.metrics.record_wait(time.perf_counter() - start)
+
+            yield
+
+    async def connect(self):
+        self._connection = await aiosqlite.connect(self.path)
+        try:
+            await self._connection.execute("PRAGMA journal_mode=WAL;")
+            await self._migrate()
+        except Exception:
+            # aiosqlite's worker thread would keep the process alive
+            await self.close()
+            raise
+
+    async def _migrate(self):
+        await self.connection.executescript(MIGRATIONS_TABLE)
+
+        async with self.connection.execute(
+            "SELECT version FROM schema_migrations;"
+        ) as cursor:
+            applied = {row[0] for row in await cursor.fetchall()}
+
+        for migration in pending_migrations(MIGRATIONS, applied):
+            # executescript commits before it starts so the transaction has to be
+            # opened by the script, the version is recorded in it before committing
+            try:
+                await self.connection.executescript(f"BEGIN;\n{migration.sql}")
+                await self.connection.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (?, ?);",
+                    (migration.version, migration.name),
+                )
+                await self.connection.commit()
+            except Exception:
+                await self.connection.rollback()
+                raise
+
+            logger.info(f"Applied migration {migration.version}: {migration.name}")
+
+    async def close(self):
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    async def _fetchall(self, query: str, *args) -> list[tuple]:
+        async with self._locked():
+            async with self.connection.execute(query, args) as cursor:
+                return list(await cursor.fetchall())
+
+    async def _execute(self, query: str, *args) -> int:
+        async with self._locked():
+            cursor = await self.connection.execute(query, args)
+            await self.connection.commit()
+            return cursor.rowcount
+
+    async def fetch_balance(self, user_id: int) -> Optional[int]:
+        rows = await self._fetchall(
+            "SELECT coins FROM coins WHERE user_id = ?;", user_id
+        )
+        return rows[0][0] if rows else None
+
+    async def fetch_all_balances(self) -> list[CoinsEntry]:
+        rows = await self._fetchall("SELECT user_id, coins FROM coins;")
+        return [CoinsEntry(*row) for row in rows]
+
+    async def set_balance(self, user_id: int, amount: int) -> Optional[int]:
+        async with self._locked():
+            async with self.connection.execute(
+                "SELECT coins FROM coins WHERE user_id = ?;", (user_id,)
+            ) as cursor:
+                row = await cursor.fetchone()
+
+            await self.connection.execute(
+                "INSERT INTO coins (user_id, coins) VALUES (?, ?) ON CONFLICT (user_id) DO UPDATE SET coins = excluded.coins;",
+                (user_id, amount),
+            )
+            await self.connection.commit()
+
+        return row[0] if row is not None else None
+
+    async def apply_deltas(self, deltas: Sequence[tuple[int, int]]) -> dict[int, int]:
+        summed: dict[int, int] = {}
+        for user_id, delta in deltas:
+            summed[user_id] = summed.get(user_id, 0) + delta
+
+        if not summed:
+            return {}
+
+        check_int64(*summed.values())
+        placeholders = ", ".join("?" * len(summed))
+
+        async with self._locked():
+            async with self.connection.execute(
+                f"SELECT user_id, coins FROM coins WHERE user_id IN ({placeholders});",
+                tuple(summed),
+            ) as cursor:
+                current = dict(await cursor.fetchall())
+
+            # sqlite turns overflowing integer arithmetic into floats so it's done here instead
+            balances = {
+                user_id: current.get(user_id, 0) + delta
+                for user_id, delta in summed.items()
+            }
+            check_int64(*balances.values())
+
+            await self.connection.executemany(
+                "INSERT INTO coins (user_id, coins) VALUES (?, ?) ON CONFLICT (user_id) DO UPDATE SET coins = excluded.coins;",
+                balances.items(),
+            )
+            await self.connection.commit()
+
+        return balances
+
+    async def delete_accounts(self, user_ids: Sequence[int]) -> list[CoinsEntry]:
+        if not user_ids:
+            return []
+
+        placeholders = ", ".join("?" * len(user_ids))
+
+        async with self._locked():
+            async with self.connection.execute(
+                f"DELETE FROM coins WHERE user_id IN ({placeholders}) RETURNING user_id, coins;",
+                tuple(user_ids),
+            ) as cursor:
+                rows = await cursor.fetchall()
+
+            await self.connection.commit()
+
+        return [CoinsEntry(*row) for row in rows]
+
+    async def leaderboard_after(
+        self, after: Optional[CoinsEntry], limit: int
+    ) -> list[CoinsEntry]:
+        if after is None:
+            rows = await self._fetchall(
+                "SELECT user_id, coins FROM coins ORDER BY coins DESC, user_id LIMIT ?;",
+                limit,
+            )
+        else:
+            rows = await self._fetchall(
+                "SELECT user_id, coins FROM coins WHERE coins <= ?1 AND (coins < ?1 OR user_id > ?2) ORDER BY coins DESC, user_id LIMIT ?3;",
+                after.coins,
+                after.user_id,
+                limit,
+            )
+
+        return [CoinsEntry(*row) for row in rows]
+
+    async def leaderboard_before(
+        self, before: Optional[CoinsEntry], limit: int
+    ) -> list[CoinsEntry]:
+        if before is None:
+            rows = await self._fetchall(
+                "SELECT user_id, coins FROM coins ORDER BY coins, user_id DESC LIMIT ?;",
+                limit,
+            )
+        else:
+            rows = await self._fetchall(
+                "SELECT user_id, coins FROM coins WHERE coins >= ?1 AND (coins > ?1 OR user_id < ?2) ORDER BY coins, user_id DESC LIMIT ?3;",
+                before.coins,
+                before.user_id,
+                limit,
+            )
+
+        return [CoinsEntry(*row) for row in reversed(rows)]
+
+    async def fetch_cooldowns(self, min_game_day: int) -> dict[tuple[str, int], int]:
+        rows = await self._fetchall(
+            "SELECT command_name, user_id, game_day FROM cooldowns WHERE game_day >= ?;",
+            min_game_day,
+        )
+        return {
+            (command_name, user_id): game_day
+            for command_name, user_id, game_day in rows
+        }
+
+    async def set_cooldown(self, command_name: str, user_id: int, game_day: int):
+        await self._execute(
+            "INSERT INTO cooldowns (command_name, user_id, game_day) VALUES (?, ?, ?) ON CONFLICT (command_name, user_id) DO UPDATE SET game_day = excluded.game_day;",
+            command_name,
+            user_id,
+            game_day,
+        )
+
+    async def clear_cooldowns(self, user_id: Optional[int] = None):
+        if user_id is None:
+            await self._execute("DELETE FROM cooldowns;")
+        else:
+            await self._execute("DELETE FROM cooldowns WHERE user_id = ?;", user_id)
+
+    async def prune_cooldowns(self, before_game_day: int, limit: int) -> int:
+        return await self._execute(
+            "DELETE FROM cooldowns WHERE rowid IN (SELECT rowid FROM cooldowns WHERE game_day < ? LIMIT ?);",
+            before_game_day,
+            limit,
+        )
+
+    async def add_purple_heart(self, user_id: int):
+        await self._execute(
+            "INSERT INTO purple_hearts (user_id) VALUES (?) ON CONFLICT DO NOTHING;",
+            user_id,
+        )
+
+    async def has_purple_heart(self, user_id: int) -> bool:
+        rows = await self._fetchall(
+            "SELECT 1 FROM purple_hearts WHERE user_id = ?;", user_id
+        )
+        return bool(rows)
+
+    async def claim_purple_heart(self, user_id: int, amount: int) -> Optional[int]:
+        async with self._locked():
+            cursor = await self.connection.execute(
+                "INSERT INTO purple_hearts (user_id) VALUES (?) ON CONFLICT DO NOTHING;",
+                (user_id,),
+            )
+
+            if cursor.rowcount == 0:
+                await self.connection.commit()
+                return None
+
+            try:
+                async with self.connection.execute(
+                    "SELECT coins FROM coins WHERE user_id = ?;", (user_id,)
+                ) as cursor:
+                    row = await cursor.fetchone()
+
+                balance = (row[0] if row is not None else 0) + amount
+                check_int64(balance)
+
+                await self.connection.execute(
+                    "INSERT INTO coins (user_id, coins) VALUES (?, ?) ON CONFLICT (user_id) DO UPDATE SET coins = excluded.coins;",
+                    (user_id, balance),
+                )
+            except Exception:
+                # the heart insert has to go too or the reward is lost for good
+                await self.connection.rollback()
+                raise
+
+            await self.connection.commit()
+
+        return balance
+
+    async def write_ledger(self, entries: Sequence[LedgerEntry]):
+        async with self._locked():
+            await self.connection.executemany(
+                f"INSERT INTO coin_ledger ({', '.join(LEDGER_COLUMNS)}) VALUES (?, ?, ?, ?, ?);",
+                [(*entry[:-1], entry.created_at.isoformat()) for entry in entries],
+            )
+            await self.connection.commit()
+
+    async def snapshot_balances(self, balances: dict[int, int]) -> int:
+        async with self._locked():
+            try:
+                await self.connection.executemany(
+                    "DELETE FROM coin_snapshots WHERE user_id = ?;",
+                    [(user_id,) for user_id in balances],
+                )
+                await self.connection.executemany(
+                    "INSERT INTO coin_snapshots (user_id, ledger_id, coins) VALUES (?1, COALESCE((SELECT max(id) FROM coin_ledger WHERE user_id = ?1), 0), ?2);",
+                    list(balances.items()),
+                )
+            except Exception:
+                await self.connection.rollback()
+                raise
+
+            await self.connection.commit()
+
+        return len(balances)
+
+    async def rebuild_balance(self, user_id: int) -> int:
+        rows = await self._fetchall(
+            """
+            WITH latest AS (
+                SELECT ledger_id, coins FROM coin_snapshots
+                WHERE user_id = ?1
+                ORDER BY ledger_id DESC
+                LIMIT 1
+            )
+            SELECT COALESCE((SELECT coins FROM latest), 0) + COALESCE(SUM(delta), 0)
+            FROM coin_ledger
+            WHERE user_id = ?1 AND id > COALESCE((SELECT ledger_id FROM latest), 0);
+            """,
+            user_id,
+        )
+        return rows[0][0]
+
+    async def fetch_ledger(self, user_id: int, limit: int) -> list[LedgerEntry]:
+        rows = await self._fetchall(
+            f"SELECT {', '.join(LEDGER_COLUMNS)} FROM coin_ledger WHERE user_id = ? ORDER BY id DESC LIMIT ?;",
+            user_id,
+            limit,
+        )
+        return [LedgerEntry(*row[:-1], datetime.fromisoformat(row[-1])) for row in rows]
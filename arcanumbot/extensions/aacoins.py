@@ -1,9 +1,9 @@
 import logging
+import re
 from random import choice
-from typing import Optional
+from typing import Optional, Union
 
 import discord
-import pendulum
 from discord.ext import commands
 
 from arcanumbot import (
@@ -11,9 +11,9 @@ from arcanumbot import (
     ConfirmationMenu,
     Connect4,
     EmojiGameMenu,
+    LeaderboardPageSource,
     MasterMindMenu,
     MenuPages,
-    NormalPageSource,
     SubContext,
     checks,
     db,
@@ -25,19 +25,34 @@ CONNECT4_WIN = 100
 CONNECT4_LOSE = 25
 CONNECT4_TIE = 65
 
+# discord ids are snowflakes, 17-20 digits for any account that exists today
+USER_ID_PATTERN = re.compile(r"\b\d{17,20}\b")
+# skipped ids listed in a bulk summary before the rest are only counted
+MAX_LISTED_SKIPPED = 20
+
 
 class IsOnCooldown(commands.CommandError):
     pass
 
 
+def _skipped_summary(skipped: list[int]) -> str:
+    if not skipped:
+        return ""
+
+    listed = ", ".join(str(user_id) for user_id in skipped[:MAX_LISTED_SKIPPED])
+    if len(skipped) > MAX_LISTED_SKIPPED:
+        listed += f" and {len(skipped) - MAX_LISTED_SKIPPED} more"
+
+    return f"\nSkipped {len(skipped)} ids that aren't members: {listed}"
+
+
 def is_on_cooldown(command_name):
     async def predicate(ctx):
         if await ctx.bot.is_on_cooldown(command_name, ctx.author.id):
-            cst = pendulum.now("America/Chicago")
-            cst_midnight = cst.replace(hour=23, minute=0, second=0, microsecond=0)
+            reset = db.next_cooldown_reset()
 
             raise IsOnCooldown(
-                f"Sorry {ctx.author.display_name}, you can play {command_name} again <t:{int(cst_midnight.timestamp())}:R> (midnight CT)."
+                f"Sorry {ctx.author.display_name}, you can play {command_name} again <t:{int(reset.timestamp())}:R> (midnight CT)."
             )
 
         else:
@@ -55,15 +70,14 @@ class aacoins(commands.Cog):
         if member.guild != self.bot.guild:
             return
 
-        coins = await self.bot.get_aacoin_amount(member.id)
+        # the balance comes back from the delete itself so this is one round trip
+        coins = await self.bot.delete_user_aacoins(member.id)
 
         if coins:
             logger.info(
-                f"Dropping {member}({member.id}) from coins db; they had {coins} coins"
+                f"Dropped {member}({member.id}) from coins db; they had {coins} coins"
             )
 
-            await self.bot.delete_user_aacoins(member.id)
-
             await self.bot.logging_channel.send(
                 f"Dropped {member}({member.id}) from coins db; they had {coins} coins"
             )
@@ -91,36 +105,60 @@ class aacoins(commands.Cog):
         """
         View all aacoins sorted by amount.
         """
-        lb = await self.bot.get_aacoin_lb()
+        total = await self.bot.count_aacoin_accounts()
 
-        if not lb:
+        if not total:
             return await ctx.send("No one has any coins right now")
 
-        entries = []
-        for user_id, coins in lb:
-            assert ctx.guild is not None
-            # attempt cache pull first
-            if (member := ctx.guild.get_member(user_id)) is not None:
-                entries.append(f"{member}: {coins}")
-                continue
-
+        async def resolve_name(user_id: int) -> str:
             try:
-                member = str(await self.bot.guild.fetch_member(user_id))
-            except discord.NotFound:
+                if (member := await self.bot.resolve_member(user_id)) is not None:
+                    return str(member)
+
                 logger.warning(f"Unbound user id {user_id} in coin db")
-                member = str(user_id)
             except Exception as exc:
                 logger.critical(f"Unhandled exception in view all: {exc}")
-                member = str(user_id)
-            finally:
-                entries.append(f"{member}: {coins}")
 
-        source = NormalPageSource(entries, per_page=10)
+            return str(user_id)
+
+        source = LeaderboardPageSource(
+            self.bot.database, total, resolve_name=resolve_name, per_page=10
+        )
 
         menu = MenuPages(source)
 
         await menu.start(ctx)
 
+    @view_aacoins.command(name="rank")
+    async def view_aacoin_rank(
+        self, ctx: commands.Context, member: Optional[discord.Member] = None
+    ):
+        """
+        View another member or your leaderboard rank.
+        """
+        if member is None:
+            # global command check prevents commands from being used in dms
+            assert isinstance(ctx.author, discord.Member)
+            member = ctx.author
+
+        rank = await self.bot.get_aacoin_rank(member.id)
+
+        if rank is None:
+            return await ctx.send(f"{member} doesn't have any {ctx.bot.aacoin}s.")
+
+        lines = [
+            f"{member} is #{rank.position} of {rank.total} with {rank.balance} {ctx.bot.aacoin}s "
+            f"(ahead of {rank.percentile:.1f}% of members)."
+        ]
+
+        if rank.above is not None:
+            lines.append(f"#{rank.position - 1} has {rank.above.coins}")
+
+        if rank.below is not None:
+            lines.append(f"#{rank.position + 1} has {rank.below.coins}")
+
+        await ctx.send("\n".join(lines))
+
     @commands.command(name="add")
     @checks.is_coin_mod_or_above()
     async def add_aacoins(
@@ -149,15 +187,119 @@ class aacoins(commands.Cog):
         await self.bot.remove_aacoins(member.id, amount)
         await ctx.send(f"Removed {amount} from {member}'s {ctx.bot.aacoin} balance.")
 
+    async def _bulk_targets(
+        self,
+        ctx: commands.Context,
+        targets: list[Union[discord.Member, discord.Role]],
+    ) -> tuple[list[int], list[int]]:
+        """
+        :return: The ids to pay and the ids from files that aren't members
+        """
+        user_ids: dict[int, None] = {}
+        skipped: dict[int, None] = {}
+
+        for target in targets:
+            if isinstance(target, discord.Role):
+                for member in target.members:
+                    if not member.bot:
+                        user_ids[member.id] = None
+            else:
+                user_ids[target.id] = None
+
+        for attachment in ctx.message.attachments:
+            content = (await attachment.read()).decode(errors="ignore")
+
+            for match in USER_ID_PATTERN.findall(content):
+                user_id = int(match)
+                if user_id in user_ids or user_id in skipped:
+                    continue
+
+                # coin sync drops non-member accounts, paying them would lose the coins
+                if await self.bot.resolve_member(user_id) is None:
+                    skipped[user_id] = None
+                else:
+                    user_ids[user_id] = None
+
+        return list(user_ids), list(skipped)
+
+    async def _apply_bulk(
+        self,
+        ctx: commands.Context,
+        amount: int,
+        targets: list[Union[discord.Member, discord.Role]],
+        reason: db.LedgerReason,
+    ) -> Optional[tuple[int, str]]:
+        """
+        :return: The number of members paid and a summary of skipped ids
+        """
+        user_ids, skipped = await self._bulk_targets(ctx, targets)
+
+        if not user_ids:
+            await ctx.send(
+                "Give a role, some members or attach a file of user ids."
+                + _skipped_summary(skipped)
+            )
+            return None
+
+        delta = amount if reason is db.LedgerReason.add else -amount
+        # one statement for everyone instead of a command per member
+        await self.bot.settle_aacoins(
+            [(user_id, delta) for user_id in user_ids], reason
+        )
+        return len(user_ids), _skipped_summary(skipped)
+
+    @commands.command(name="add-bulk")
+    @checks.is_coin_mod_or_above()
+    async def add_aacoins_bulk(
+        self,
+        ctx: commands.Context,
+        amount: int,
+        targets: commands.Greedy[Union[discord.Member, discord.Role]],
+    ):
+        """
+        Add aacoins to every member of the given roles, the given members and any user ids in an attached file.
+        """
+        if amount < 1:
+            return await ctx.send("You can only add positive amounts of coins")
+
+        result = await self._apply_bulk(ctx, amount, targets, db.LedgerReason.add)
+        if result is not None:
+            count, skipped = result
+            await ctx.send(
+                f"Added {amount} to the {ctx.bot.aacoin} balance of {count} members, {amount * count} total."
+                + skipped
+            )
+
+    @commands.command(name="remove-bulk", aliases=["rem-bulk"])
+    @checks.is_coin_mod_or_above()
+    async def remove_aacoins_bulk(
+        self,
+        ctx: commands.Context,
+        amount: int,
+        targets: commands.Greedy[Union[discord.Member, discord.Role]],
+    ):
+        """
+        Remove aacoins from every member of the given roles, the given members and any user ids in an attached file.
+        """
+        if amount < 1:
+            return await ctx.send("You can only remove positive amounts of coins")
+
+        result = await self._apply_bulk(ctx, amount, targets, db.LedgerReason.remove)
+        if result is not None:
+            count, skipped = result
+            await ctx.send(
+                f"Removed {amount} from the {ctx.bot.aacoin} balance of {count} members, {amount * count} total."
+                + skipped
+            )
+
     @commands.command(name="clear")
     @checks.is_coin_mod_or_above()
     async def clear_aacoins(self, ctx: commands.Context, member: discord.Member):
         """
         Clear a member's aacoin(s).
         """
-        ammount = await self.bot.get_aacoin_amount(member.id)
-        await self.bot.delete_user_aacoins(member.id)
-        await ctx.send(f"Cleared {member}'s {ctx.bot.aacoin} balance of {ammount}")
+        ammount = await self.bot.delete_user_aacoins(member.id)
+        await ctx.send(f"Cleared {member}'s {ctx.bot.aacoin} balance of {ammount or 0}")
 
     @commands.command(name="cooldown-reset", aliases=["cr"])
     @checks.is_coin_mod_or_above()
@@ -176,12 +318,11 @@ class aacoins(commands.Cog):
         value = await game.run(ctx)
 
         if value:
-            current = await self.bot.get_aacoin_amount(ctx.author.id)
-            await self.bot.set_aacoins(ctx.author.id, current + value)
+            total = await self.bot.credit_aacoins(ctx.author.id, value)
 
             await ctx.send(
                 f"\N{PARTY POPPER} {ctx.author.mention} won {value} {ctx.bot.aacoin}s\n"
-                f"they now have a total of {await self.bot.get_aacoin_amount(ctx.author.id)}"
+                f"they now have a total of {total}"
             )
 
         else:
@@ -203,12 +344,11 @@ class aacoins(commands.Cog):
         value = await game.run(ctx)
 
         if value:
-            current = await self.bot.get_aacoin_amount(ctx.author.id)
-            await self.bot.set_aacoins(ctx.author.id, current + value)
+            total = await self.bot.credit_aacoins(ctx.author.id, value)
 
             await ctx.send(
                 f"\N{PARTY POPPER} {ctx.author.mention} won {value} {ctx.bot.aacoin}s\n"
-                f"they now have a total of {await self.bot.get_aacoin_amount(ctx.author.id)}"
+                f"they now have a total of {total}"
             )
 
         elif value == 0:
@@ -245,20 +385,17 @@ class aacoins(commands.Cog):
         winner = await game.run(ctx)
         if winner:
             if isinstance(winner, tuple):
-                # Todo: make a convince method for this
-                current = await self.bot.get_aacoin_amount(winner[0].id)
-                await self.bot.set_aacoins(winner[0].id, current + CONNECT4_TIE)
-                current = await self.bot.get_aacoin_amount(winner[1].id)
-                await self.bot.set_aacoins(winner[1].id, current + CONNECT4_TIE)
+                await self.bot.settle_aacoins(
+                    [(winner[0].id, CONNECT4_TIE), (winner[1].id, CONNECT4_TIE)]
+                )
                 await ctx.send(
                     f"{player1.mention} and {player2.mention} tied and both gained {CONNECT4_TIE}{ctx.bot.aacoin}s."
                 )
             else:
                 loser = player1 if winner == player2 else player2
-                current = await self.bot.get_aacoin_amount(winner.id)
-                await self.bot.set_aacoins(winner.id, current + CONNECT4_WIN)
-                current = await self.bot.get_aacoin_amount(loser.id)
-                await self.bot.set_aacoins(loser.id, current + CONNECT4_LOSE)
+                await self.bot.settle_aacoins(
+                    [(winner.id, CONNECT4_WIN), (loser.id, CONNECT4_LOSE)]
+                )
                 await ctx.send(
                     f"{winner.mention} has won and gained {CONNECT4_WIN}{ctx.bot.aacoin}s.\n"
                     f"{loser.mention} gained {CONNECT4_LOSE}{ctx.bot.aacoin}s for playing."
@@ -1,13 +1,16 @@
 ﻿import logging
 from asyncio import sleep
 
-import pendulum
 from discord.ext import commands, tasks
 
 from arcanumbot import ArcanumBot
 
 logger = logging.getLogger(__name__)
 
+PRUNE_BATCH_SIZE = 500
+# pause between batches so pruning never hogs the pool
+PRUNE_BATCH_DELAY = 1
+
 
 class Cooldowns(commands.Cog):
     """Handles cooldowns"""
@@ -15,39 +18,28 @@ class Cooldowns(commands.Cog):
     def __init__(self, bot: ArcanumBot):
         self.bot = bot
         # for some reason I have to do this instead of decorators, no idea why
-        self.cooldown_cycle.before_loop(self.cooldown_cycle_before)
-        self.cooldown_cycle.after_loop(self.cooldown_cycle_after)
-        if not self.cooldown_cycle.get_task():
-            self.cooldown_cycle.start()
+        self.cooldown_prune.after_loop(self.cooldown_prune_after)
+        if not self.cooldown_prune.get_task():
+            self.cooldown_prune.start()
 
-    @tasks.loop(hours=24)
-    async def cooldown_cycle(self):
-        """
-        Resets cooldowns every 24 hours
+    @tasks.loop(hours=1)
+    async def cooldown_prune(self):
         """
-        logger.info("Cooldown loop resetting cooldowns")
-        await self.bot.clear_cooldowns()
-
-    # @cooldown_cycle.before_loop
-    async def cooldown_cycle_before(self, _):
-        cst = pendulum.now("America/Chicago")
-        cst_midnight = cst.replace(hour=23, minute=0, second=0, microsecond=0)
+        Deletes cooldowns from previous game days in small batches
 
-        # noinspection PyTypeChecker
-        diff = cst.diff(cst_midnight)
-        total_seconds = diff.total_seconds()
-
-        logger.info(f"Cooldown cycle sleeping for {total_seconds} seconds.")
-
-        await sleep(total_seconds)
+        Cooldowns expire on their own when the game day changes so this
+        only keeps the table small
+        """
+        while await self.bot.prune_cooldowns(PRUNE_BATCH_SIZE) >= PRUNE_BATCH_SIZE:
+            await sleep(PRUNE_BATCH_DELAY)
 
-    # @cooldown_cycle.after_loop
-    async def cooldown_cycle_after(self, _):
-        if self.cooldown_cycle.failed():
+    # @cooldown_prune.after_loop
+    async def cooldown_prune_after(self, _):
+        if self.cooldown_prune.failed():
             logger.critical(
-                "Cooldown cycle somehow errored out, restarting.", exc_info=True
+                "Cooldown prune loop somehow errored out, restarting.", exc_info=True
             )
-            self.cooldown_cycle.restart()
+            self.cooldown_prune.restart()
 
 
 async def setup(bot: ArcanumBot):
@@ -3,7 +3,6 @@ from datetime import timedelta
 
 import discord
 from discord.ext import commands
-from humanize import naturaldelta
 
 from arcanumbot import ArcanumBot
 
@@ -23,6 +22,9 @@ async def on_command_error(ctx: commands.Context[ArcanumBot], error):
         return await ctx.send(str(error))
 
     if isinstance(error, commands.CommandOnCooldown):
+        # only needed for this error so it isn't imported at startup
+        from humanize import naturaldelta
+
         delta = timedelta(seconds=error.retry_after)
         natural = naturaldelta(delta)
         # TODO: use pendulum for this so we can drop the humanize dependency
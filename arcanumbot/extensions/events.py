@@ -8,6 +8,7 @@ from arcanumbot import ArcanumBot, constants
 LARGE_RED_CIRCLE = "\N{LARGE RED CIRCLE}"
 LARGE_BLUE_DIAMOND = "\N{LARGE BLUE DIAMOND}"
 PURPLE_HEART = "\N{PURPLE HEART}"
+PURPLE_HEART_REWARD = 100
 
 TARGET_MESSAGE = constants.reaction_message
 ANNOUNCMENTS = constants.announcments_role
@@ -42,7 +43,7 @@ class Events(commands.Cog):
         ):
             return
 
-        member = await self.bot.guild.fetch_member(payload.user_id)
+        member = await self.bot.resolve_member(payload.user_id)
 
         if member:
             await self.reaction_map[str(payload.emoji)](member)
@@ -84,11 +85,8 @@ class Events(commands.Cog):
             await member.add_roles(giveaways_role)
 
     async def on_purple_heart(self, member: discord.Member):
-        if not await self.bot.is_purple_heart(member.id):
-            current = await self.bot.get_aacoin_amount(member.id)
-
-            await self.bot.set_aacoins(member.id, current + 100)
-            await self.bot.set_purple_heart(member.id)
+        # a no-op if they already claimed it, so reaction spam can't double pay
+        await self.bot.claim_purple_heart(member.id, PURPLE_HEART_REWARD)
 
 
 async def setup(bot: ArcanumBot):
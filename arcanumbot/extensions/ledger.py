@@ -0,0 +1,58 @@
+import logging
+
+import discord
+from discord.ext import commands, tasks
+
+from arcanumbot import ArcanumBot, checks
+
+logger = logging.getLogger(__name__)
+
+
+class Ledger(commands.Cog):
+    """Coin ledger auditing and snapshots"""
+
+    def __init__(self, bot: ArcanumBot):
+        self.bot = bot
+        self.snapshot_cycle.after_loop(self.snapshot_cycle_after)
+        if not self.snapshot_cycle.get_task():
+            self.snapshot_cycle.start()
+
+    @tasks.loop(hours=6)
+    async def snapshot_cycle(self):
+        """
+        Compacts the coin ledger into balance snapshots
+        """
+        await self.bot.snapshot_aacoins()
+
+    async def snapshot_cycle_after(self, _):
+        if self.snapshot_cycle.failed():
+            logger.critical(
+                "Snapshot cycle somehow errored out, restarting.", exc_info=True
+            )
+            self.snapshot_cycle.restart()
+
+    @commands.command(name="ledger")
+    @checks.is_coin_mod_or_above()
+    async def view_ledger(self, ctx: commands.Context, user: discord.User):
+        """
+        View a user's recent aacoin changes.
+        """
+        entries = await self.bot.get_aacoin_ledger(user.id)
+
+        if not entries:
+            return await ctx.send(f"{user} has no {ctx.bot.aacoin} history.")
+
+        rebuilt = await self.bot.rebuild_aacoin_balance(user.id)
+        current = await self.bot.get_aacoin_amount(user.id)
+
+        lines = [
+            f"<t:{int(entry.created_at.timestamp())}:f> {entry.delta:+} ({entry.reason}) => {entry.balance}"
+            for entry in entries
+        ]
+        lines.append(f"Current balance: {current}, rebuilt from ledger: {rebuilt}")
+
+        await ctx.send("\n".join(lines))
+
+
+async def setup(bot: ArcanumBot):
+    await bot.add_cog(Ledger(bot))
@@ -0,0 +1,168 @@
+import logging
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import discord
+from discord.ext import commands
+
+from arcanumbot import ArcanumBot, ConfirmationMenu
+from arcanumbot.profiles import current_rss
+
+logger = logging.getLogger(__name__)
+
+
+# what discord allows without boosts, used outside of guilds
+DEFAULT_FILESIZE_LIMIT = 25 * 1024 * 1024
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:.1f}"
+
+
+def _row_counts(counts: dict[str, int]) -> str:
+    return ", ".join(f"{count} {table}" for table, count in counts.items())
+
+
+class Owner(commands.Cog):
+    """Owner only diagnostics"""
+
+    def __init__(self, bot: ArcanumBot):
+        self.bot = bot
+
+    async def cog_check(self, ctx: commands.Context) -> bool:
+        return await self.bot.is_owner(ctx.author)
+
+    @commands.group(name="dbstats", invoke_without_command=True)
+    async def view_db_stats(self, ctx: commands.Context):
+        """
+        View latency, pool wait time and errors per database operation.
+        """
+        stats = self.bot.get_database_metrics()
+
+        if not stats:
+            return await ctx.send("No database operations recorded yet.")
+
+        lines = [
+            f"{'operation':<24} {'calls':>7} {'err':>4} {'p50':>7} {'p95':>7} {'p99':>7} {'wait95':>7}"
+        ]
+        for entry in stats:
+            lines.append(
+                f"{entry.name[:24]:<24} {entry.calls:>7} {entry.errors:>4} {_ms(entry.p50):>7} "
+                f"{_ms(entry.p95):>7} {_ms(entry.p99):>7} {_ms(entry.wait_p95):>7}"
+            )
+
+        # keep under the 2000 character message limit, slowest operations come first
+        message = "```\n"
+        for line in lines:
+            if len(message) + len(line) > 1950:
+                break
+
+            message += line + "\n"
+
+        await ctx.send(message + "```\nTimes are in ms over recent calls.")
+
+    @view_db_stats.command(name="reset")
+    async def reset_db_stats(self, ctx: commands.Context):
+        """
+        Clear the recorded database stats.
+        """
+        self.bot.reset_database_metrics()
+        await ctx.send("Database stats cleared.")
+
+    @commands.command(name="memory")
+    async def view_memory(self, ctx: commands.Context):
+        """
+        View the bot's memory use and what its caches hold.
+        """
+        rss = current_rss() / 1024 / 1024
+        profile = self.bot.profile
+        resolver = self.bot.member_resolver
+        message_cache = (
+            f"{len(self.bot.cached_messages)}/{profile.max_messages}"
+            if profile.max_messages
+            else "disabled"
+        )
+
+        await ctx.send(
+            f"{rss:.1f} MiB resident with the {profile.name} profile\n"
+            f"Members cached: {len(self.bot.guild.members)} (chunked: {self.bot.guild.chunked})\n"
+            f"Users cached: {len(self.bot.users)}\n"
+            f"Messages cached: {message_cache}\n"
+            f"Balances indexed: {len(self.bot.database.balance_index)}\n"
+            f"Member lookups: {resolver.gateway_hits} gateway, {resolver.cache_hits} cached, "
+            f"{resolver.fetches} fetched ({len(resolver)} held)"
+        )
+
+    @commands.command(name="messagestats")
+    async def view_message_stats(self, ctx: commands.Context):
+        """
+        View how many messages the prefix filter rejected before parsing.
+        """
+        counts = self.bot.message_counts
+        total = counts["filtered"] + counts["dispatched"]
+        filtered_percent = counts["filtered"] / total * 100 if total else 0.0
+
+        await ctx.send(
+            f"Filtered: {counts['filtered']} ({filtered_percent:.1f}%)\n"
+            f"Dispatched: {counts['dispatched']}"
+        )
+
+    @commands.command(name="backup")
+    async def backup(self, ctx: commands.Context, path: Optional[Path] = None):
+        """
+        Back up coins, cooldowns and purple hearts.
+
+        The backup is attached unless a path on the bot's host is given.
+        """
+        if path is not None:
+            counts = await self.bot.backup_database(path)
+            return await ctx.send(f"Backed up {_row_counts(counts)} to {path}.")
+
+        filesize_limit = (
+            ctx.guild.filesize_limit if ctx.guild else DEFAULT_FILESIZE_LIMIT
+        )
+        timestamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / f"arcanumbot-{timestamp}.tar.gz"
+            counts = await self.bot.backup_database(path)
+
+            if path.stat().st_size > filesize_limit:
+                return await ctx.send(
+                    "Backup is too large to upload, give a path to write it to instead."
+                )
+
+            await ctx.send(f"Backed up {_row_counts(counts)}.", file=discord.File(path))
+
+    @commands.command(name="restore")
+    async def restore(self, ctx: commands.Context, path: Optional[Path] = None):
+        """
+        Replace coins, cooldowns and purple hearts with a backup.
+
+        Attach the backup or give a path on the bot's host.
+        """
+        if path is None and not ctx.message.attachments:
+            return await ctx.send("Attach a backup or give a path to one.")
+
+        menu = ConfirmationMenu(
+            "This replaces every balance, cooldown and purple heart, continue?",
+            owner_id=ctx.author.id,
+        )
+        if not await menu.get_response(ctx):
+            return await ctx.send("Restore canceled.")
+
+        if path is not None:
+            counts = await self.bot.restore_database(path)
+        else:
+            with tempfile.TemporaryDirectory() as directory:
+                path = Path(directory) / "backup.tar.gz"
+                await ctx.message.attachments[0].save(path)
+                counts = await self.bot.restore_database(path)
+
+        await ctx.send(f"Restored {_row_counts(counts)}.")
+
+
+async def setup(bot: ArcanumBot):
+    await bot.add_cog(Owner(bot))
@@ -1,11 +1,13 @@
 ﻿from itertools import cycle
 from random import sample, shuffle
-from typing import Optional, Tuple, Union
+from typing import TYPE_CHECKING, Optional, Tuple, Union
 
 import discord
-import numpy
 from discord.ext import menus
 
+if TYPE_CHECKING:
+    import numpy
+
 VARIATION_SELECTOR = "\N{VARIATION SELECTOR-16}"
 
 EMOJI_LIST = [
@@ -197,6 +199,9 @@ class Connect4(menus.Menu):
         self.current_player = next(self.player_cycle)
         self.last_move = None
         self.winner = None
+        # numpy is slow to import and only needed once a game starts
+        import numpy
+
         # noinspection PyTypeChecker
         self.board = numpy.full((6, 7), self.filler)
         # This is kinda hacky but /shrug
@@ -313,7 +318,9 @@ class Connect4(menus.Menu):
             if check(column):
                 return True
 
-        def get_diagonals(matrix: numpy.ndarray):
+        import numpy
+
+        def get_diagonals(matrix: "numpy.ndarray"):
             dias = []
             for offset in range(-2, 4):
                 dias.append(list(matrix.diagonal(offset)))
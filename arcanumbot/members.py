@@ -0,0 +1,112 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import discord
+
+DEFAULT_MAX_SIZE = 1000
+# seconds, fetched members don't get gateway updates so they're kept briefly
+DEFAULT_TTL = 300.0
+DEFAULT_NEGATIVE_TTL = 60.0
+
+
+class MemberResolver:
+    """
+    Look up members by id with as few fetch_member calls as possible
+
+    Checks the gateway cache, then a TTL cache of previous fetches (including
+    users that weren't found), and only then fetches over HTTP; concurrent
+    lookups of the same id share one fetch
+    """
+
+    def __init__(
+        self,
+        *,
+        max_size: int = DEFAULT_MAX_SIZE,
+        ttl: float = DEFAULT_TTL,
+        negative_ttl: float = DEFAULT_NEGATIVE_TTL,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.gateway_hits = 0
+        self.cache_hits = 0
+        self.fetches = 0
+        # (guild_id, user_id) -> (expires_at, member or None if they weren't found)
+        self._entries: OrderedDict[
+            tuple[int, int], tuple[float, Optional[discord.Member]]
+        ] = OrderedDict()
+        self._in_flight: dict[tuple[int, int], asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _store(self, key: tuple[int, int], member: Optional[discord.Member]):
+        if self.max_size <= 0:
+            return
+
+        ttl = self.ttl if member is not None else self.negative_ttl
+        self._entries[key] = (time.monotonic() + ttl, member)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def _fetch(
+        self, guild: discord.Guild, key: tuple[int, int]
+    ) -> Optional[discord.Member]:
+        self.fetches += 1
+
+        try:
+            member: Optional[discord.Member] = await guild.fetch_member(key[1])
+        except discord.NotFound:
+            member = None
+        finally:
+            del self._in_flight[key]
+
+        self._store(key, member)
+        return member
+
+    async def resolve(
+        self, guild: discord.Guild, user_id: int
+    ) -> Optional[discord.Member]:
+        """
+        Get a guild member
+
+        :param guild: The guild to look in
+        :param user_id: The id of the user
+        :return: The member or None if they aren't in the guild
+        """
+        if (member := guild.get_member(user_id)) is not None:
+            self.gateway_hits += 1
+            return member
+
+        key = (guild.id, user_id)
+
+        if (entry := self._entries.get(key)) is not None:
+            expires_at, member = entry
+
+            if expires_at > time.monotonic():
+                self.cache_hits += 1
+                self._entries.move_to_end(key)
+                return member
+
+            del self._entries[key]
+
+        task = self._in_flight.get(key)
+
+        if task is None:
+            task = self._in_flight[key] = asyncio.create_task(self._fetch(guild, key))
+
+        # shielded so one caller being cancelled doesn't cancel it for the others
+        return await asyncio.shield(task)
+
+    def invalidate(self, guild_id: int, user_id: int):
+        """
+        Drop a cached lookup, used when the gateway says a member changed
+        """
+        self._entries.pop((guild_id, user_id), None)
+
+    def clear(self):
+        self._entries.clear()
@@ -1,8 +1,12 @@
-﻿from typing import Optional, Sequence
+﻿import asyncio
+from math import ceil
+from typing import Awaitable, Callable, Optional, Sequence
 
 import discord
 from discord.ext import commands, menus
 
+from .db import CoinsEntry, Database
+
 
 class MenuPages(menus.MenuPages):
     def __init__(self, source, **kwargs):
@@ -69,6 +73,86 @@ class NormalPageSource(menus.ListPageSource):
             return "\n".join(page)
 
 
+class LeaderboardPageSource(menus.PageSource):
+    """
+    Fetches coin leaderboard pages on demand using keyset cursors
+
+    Only the pages next to the one being shown are kept around, their
+    first/last entries are the cursors for moving forwards and backwards
+
+    Names are only resolved for the page being shown and are remembered
+    for the lifetime of the source
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        total: int,
+        *,
+        resolve_name: Callable[[int], Awaitable[str]],
+        per_page: int = 10,
+    ):
+        self.database = database
+        self.total = total
+        self.resolve_name = resolve_name
+        self.per_page = per_page
+        self._pages: dict[int, list[CoinsEntry]] = {}
+        self._names: dict[int, str] = {}
+
+    def is_paginating(self) -> bool:
+        return self.total > self.per_page
+
+    def get_max_pages(self) -> int:
+        return max(1, ceil(self.total / self.per_page))
+
+    async def _fetch_page(self, page_number: int) -> list[CoinsEntry]:
+        if page_number == 0:
+            return await self.database.get_leaderboard_after(None, self.per_page)
+
+        if (previous_page := self._pages.get(page_number - 1)) is not None:
+            return await self.database.get_leaderboard_after(
+                previous_page[-1], self.per_page
+            )
+
+        if (next_page := self._pages.get(page_number + 1)) is not None:
+            return await self.database.get_leaderboard_before(
+                next_page[0], self.per_page
+            )
+
+        # the only page without a loaded neighbour is the last page
+        remainder = self.total - page_number * self.per_page
+        return await self.database.get_leaderboard_before(None, max(remainder, 1))
+
+    async def get_page(self, page_number: int) -> list[CoinsEntry]:
+        page = self._pages.get(page_number)
+
+        if page is None:
+            page = await self._fetch_page(page_number)
+
+        self._pages = {
+            number: entries
+            for number, entries in self._pages.items()
+            if abs(number - page_number) == 1
+        }
+        self._pages[page_number] = page
+
+        return page
+
+    async def format_page(self, menu, page: list[CoinsEntry]) -> str:
+        if not page:
+            return "No entries"
+
+        unresolved = [
+            entry.user_id for entry in page if entry.user_id not in self._names
+        ]
+        names = await asyncio.gather(*map(self.resolve_name, unresolved))
+        self._names.update(zip(unresolved, names))
+
+        return "\n".join(
+            f"{self._names[entry.user_id]}: {entry.coins}" for entry in page
+        )
+
+
 class ConfirmationMenu(menus.Menu):
     def __init__(
         self,
@@ -0,0 +1,72 @@
+from typing import NamedTuple, Optional
+
+import discord
+
+
+class MemoryProfile(NamedTuple):
+    name: str
+    intents: discord.Intents
+    member_cache_flags: discord.MemberCacheFlags
+    # None disables the message cache, which also stops edited commands being rerun
+    max_messages: Optional[int]
+    # when False reconciliation chunks the guild in the background instead
+    chunk_guilds_at_startup: bool
+
+
+def _lean_intents() -> discord.Intents:
+    # members for the member cache, reactions for games and roles, messages for commands
+    # dm reactions too since menus like the owner's restore confirmation run in dms
+    return discord.Intents(
+        guilds=True,
+        members=True,
+        guild_messages=True,
+        guild_reactions=True,
+        dm_messages=True,
+        dm_reactions=True,
+        message_content=True,
+    )
+
+
+def _profiles() -> dict[str, MemoryProfile]:
+    lean = _lean_intents()
+
+    return {
+        profile.name: profile
+        for profile in (
+            MemoryProfile(
+                name="full",
+                intents=discord.Intents.all(),
+                member_cache_flags=discord.MemberCacheFlags.all(),
+                max_messages=10_000,
+                chunk_guilds_at_startup=True,
+            ),
+            MemoryProfile(
+                name="lean",
+                intents=lean,
+                member_cache_flags=discord.MemberCacheFlags.from_intents(lean),
+                max_messages=1_000,
+                chunk_guilds_at_startup=True,
+            ),
+            MemoryProfile(
+                name="minimal",
+                intents=lean,
+                member_cache_flags=discord.MemberCacheFlags.from_intents(lean),
+                max_messages=None,
+                chunk_guilds_at_startup=False,
+            ),
+        )
+    }
+
+
+PROFILES = _profiles()
+DEFAULT_PROFILE = "lean"
+
+
+def current_rss() -> int:
+    """
+    Resident memory of this process in bytes
+    """
+    # psutil is only needed for the reports
+    import psutil
+
+    return psutil.Process().memory_info().rss
@@ -0,0 +1,75 @@
+"""
+Measure cold start cost of the bot
+
+Every scenario runs in a fresh interpreter so nothing is already imported,
+run from the repo root with: python scripts/bench_startup.py
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+import click
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# each snippet prints {"seconds": ..., "rss": ...} as its last line
+MEASURE = """
+import json, time
+start = time.perf_counter()
+{body}
+seconds = time.perf_counter() - start
+import psutil
+print(json.dumps({{"seconds": seconds, "rss": psutil.Process().memory_info().rss}}))
+"""
+
+SCENARIOS = {
+    "interpreter": "pass",
+    "import arcanumbot": "import arcanumbot",
+    "load extensions": """
+import asyncio
+from arcanumbot import ArcanumBot
+from arcanumbot.db import Database, MemoryBackend
+
+async def load():
+    bot = ArcanumBot(database=Database(backend=MemoryBackend()), load_jishaku={jishaku})
+    await bot.load_all_extensions()
+
+asyncio.run(load())
+""",
+}
+
+
+def run_scenario(body: str) -> dict[str, float]:
+    result = subprocess.run(
+        [sys.executable, "-c", MEASURE.format(body=body)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+@click.command()
+@click.option("--runs", type=click.IntRange(min=1), default=5, show_default=True)
+@click.option(
+    "--jishaku/--no-jishaku",
+    help="Load jishaku in the extension scenario",
+    default=True,
+    show_default=True,
+)
+def main(runs: int, jishaku: bool):
+    click.echo(f"{'scenario':<20} {'seconds':>8} {'rss MiB':>8}  (median of {runs})")
+
+    for name, body in SCENARIOS.items():
+        samples = [run_scenario(body.format(jishaku=jishaku)) for _ in range(runs)]
+        seconds = statistics.median(sample["seconds"] for sample in samples)
+        rss = statistics.median(sample["rss"] for sample in samples) / 1024 / 1024
+        click.echo(f"{name:<20} {seconds:>8.3f} {rss:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import asyncio
+import os
+import signal
+import sys
+
+import pytest
+
+from arcanumbot import ArcanumBot
+from arcanumbot.db import Database, MemoryBackend
+
+
+class SlowBackend(MemoryBackend):
+    # real writes take time, the shutdown has to wait for them
+    async def apply_deltas(self, deltas):
+        await asyncio.sleep(0.2)
+        return await super().apply_deltas(deltas)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs unix signal handlers")
+def test_sigterm_flushes_buffered_deltas():
+    backend = SlowBackend()
+    database = Database(backend=backend, write_behind=True, flush_interval=60)
+    bot = ArcanumBot(database=database, load_jishaku=False)
+
+    async def runner():
+        # mirrors Client.run, which leaves the context once start returns on close
+        async with bot:
+            await bot.setup_hook()
+            asyncio.ensure_future(database.credit_coins(1, 10))
+            await asyncio.sleep(0)
+
+            os.kill(os.getpid(), signal.SIGTERM)
+            while not bot.is_closed():
+                await asyncio.sleep(0.01)
+
+    asyncio.run(runner())
+
+    assert backend._coins == {1: 10}
+    assert len(backend._ledger) == 1